@@ -1,8 +1,8 @@
 import streamlit as st
 
+from db.bootstrap import ensure_bootstrapped
 from db.crud import process_recurring_transactions
-from db.database import init_db
-from db.seed import run_migrations, seed_categories
+from db.read_cache import read_cache_stats
 
 st.set_page_config(
     page_title="Budget Tracker",
@@ -10,21 +10,29 @@ st.set_page_config(
     layout="wide",
 )
 
-init_db()
-seed_categories()
-run_migrations()
+ensure_bootstrapped()
 
 # Process recurring transactions once per browser session
 if "recurring_processed" not in st.session_state:
-    n = process_recurring_transactions()
+    report = process_recurring_transactions()
     st.session_state.recurring_processed = True
-    st.session_state.recurring_count = n
+    st.session_state.recurring_count = report["created"]
+    st.session_state.recurring_report = report
 
 st.title("💰 Budget Tracker")
 st.markdown("---")
 
 if st.session_state.get("recurring_count", 0) > 0:
     st.success(f"{st.session_state.recurring_count} recurring transaction(s) were added automatically today.")
+    report = st.session_state.recurring_report
+    with st.expander("Details"):
+        for s in report["schedules"]:
+            if s["created"] or s["ended"]:
+                st.write(
+                    f"**{s['description']}** — {s['created']} added"
+                    + (" (schedule has ended)" if s["ended"] else "")
+                )
+        st.caption(f"Caught up in {report['elapsed_s']:.2f}s")
 
 st.markdown(
     """
@@ -40,3 +48,10 @@ st.markdown(
 )
 
 st.info("Your data is stored locally on this computer and never leaves your machine.")
+
+with st.expander("🔧 Diagnostics"):
+    cache = read_cache_stats()
+    st.caption(
+        f"Read cache: {cache['hit_rate']:.0%} hit rate ({cache['hits']:,} hits, {cache['misses']:,} misses), "
+        f"{cache['entries']} of {cache['max_entries']} entries"
+    )
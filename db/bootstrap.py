@@ -0,0 +1,69 @@
+"""
+One-time database bootstrap.
+
+Every page calls ensure_bootstrapped() at the top of each rerun. The first call
+in a server process brings the schema and seed data up to date, using the
+versions stored in the app_meta table to skip work that an earlier process has
+already done. Every later call returns without touching the database.
+"""
+
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from .database import get_session, init_db
+from .migrations import MIGRATIONS
+from .models import AppMeta
+from .read_cache import bump_generation
+from .seed import ensure_uncategorised_category, seed_categories
+
+SCHEMA_VERSION = max(version for version, _, _ in MIGRATIONS)
+# Bump when SEED_DATA or the category migrations in db/seed.py change
+SEED_VERSION = 1
+
+_lock = threading.Lock()
+_bootstrapped = False
+
+
+def _read_meta():
+    session = get_session()
+    try:
+        return {m.key: m.value for m in session.query(AppMeta).all()}
+    except OperationalError:
+        return {}  # app_meta doesn't exist yet — brand new or pre-bootstrap database
+    finally:
+        session.close()
+
+
+def _write_meta(values):
+    session = get_session()
+    try:
+        for key, value in values.items():
+            session.merge(AppMeta(key=key, value=str(value)))
+        session.commit()
+    finally:
+        session.close()
+
+
+def ensure_bootstrapped():
+    """Create/upgrade the schema and seed categories once per process."""
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    # Several browser sessions can hit a cold server at once; only one runs setup
+    with _lock:
+        if _bootstrapped:
+            return
+        meta = _read_meta()
+        updates = {}
+        if meta.get("schema_version") != str(SCHEMA_VERSION):
+            init_db()
+            updates["schema_version"] = SCHEMA_VERSION
+        if meta.get("seed_version") != str(SEED_VERSION):
+            seed_categories()
+            ensure_uncategorised_category()
+            updates["seed_version"] = SEED_VERSION
+        if updates:
+            _write_meta(updates)
+            bump_generation()
+        _bootstrapped = True
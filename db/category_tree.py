@@ -0,0 +1,87 @@
+"""
+Process-wide in-memory copy of the category hierarchy.
+
+Categories change rarely but are read on nearly every rerun (cascading
+dropdowns, the Categories page, import mapping). The whole table is loaded
+once into a CategoryTree and served from memory until a write calls
+invalidate_category_tree().
+"""
+
+import threading
+
+from .database import get_session
+from .models import Category
+
+
+class CategoryTree:
+    def __init__(self, rows):
+        # id → node dict
+        self.nodes = {r["id"]: r for r in rows}
+        # parent_id → [child ids] sorted by name; top-level categories live under None
+        self.children = {}
+        for r in sorted(rows, key=lambda r: r["name"]):
+            self.children.setdefault(r["parent_id"], []).append(r["id"])
+        # subcategory name (lowercased) → id; on duplicate names the highest id wins
+        self.subcat_ids_by_name = {
+            r["name"].lower(): r["id"]
+            for r in sorted(rows, key=lambda r: r["id"])
+            if r["parent_id"] is not None
+        }
+
+    def get(self, cat_id):
+        node = self.nodes.get(cat_id)
+        return dict(node) if node else None
+
+    def parents(self, flow_type=None):
+        return [
+            dict(self.nodes[cid])
+            for cid in self.children.get(None, [])
+            if not flow_type or self.nodes[cid]["flow_type"] == flow_type
+        ]
+
+    def subcategories(self, parent_id):
+        return [dict(self.nodes[cid]) for cid in self.children.get(parent_id, [])]
+
+    def all(self):
+        return [dict(n) for n in sorted(self.nodes.values(), key=lambda n: (n["flow_type"], n["name"]))]
+
+    def find(self, name, flow_type):
+        """First category (lowest id) with this exact name and flow type, or None."""
+        for cid in sorted(self.nodes):
+            node = self.nodes[cid]
+            if node["name"] == name and node["flow_type"] == flow_type:
+                return dict(node)
+        return None
+
+
+_lock = threading.Lock()
+_tree = None
+
+
+def _load():
+    session = get_session()
+    try:
+        return CategoryTree([
+            {"id": c.id, "name": c.name, "parent_id": c.parent_id, "flow_type": c.flow_type}
+            for c in session.query(Category).all()
+        ])
+    finally:
+        session.close()
+
+
+def get_category_tree():
+    global _tree
+    tree = _tree
+    if tree is None:
+        with _lock:
+            if _tree is None:
+                _tree = _load()
+            tree = _tree
+    return tree
+
+
+def invalidate_category_tree():
+    """Drop the cached tree; the next reader reloads it. Call after any category write."""
+    global _tree
+    with _lock:
+        _tree = None
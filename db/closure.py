@@ -0,0 +1,51 @@
+"""
+Closure table for the category hierarchy (the category_closure table).
+
+Holds one row per (ancestor, descendant) pair, including each category paired
+with itself at depth 0. A total for any ancestor, at any nesting depth, is a
+single join from category_closure to the rows being summed.
+
+add_category/delete_category keep it up to date incrementally; bulk changes
+to categories (seeding, the category migration) call rebuild_category_closure().
+"""
+
+from sqlalchemy import text
+
+
+def add_closure_rows(session, cat_id, parent_id):
+    """Link a newly inserted category (already flushed) to itself and its ancestors."""
+    session.execute(
+        text("INSERT INTO category_closure (ancestor_id, descendant_id, depth) VALUES (:id, :id, 0)"),
+        {"id": cat_id},
+    )
+    if parent_id is not None:
+        session.execute(
+            text(
+                "INSERT INTO category_closure (ancestor_id, descendant_id, depth) "
+                "SELECT ancestor_id, :id, depth + 1 FROM category_closure WHERE descendant_id = :parent_id"
+            ),
+            {"id": cat_id, "parent_id": parent_id},
+        )
+
+
+def delete_closure_rows(session, cat_id):
+    """Remove a leaf category's rows. Categories with children can't be deleted."""
+    session.execute(
+        text("DELETE FROM category_closure WHERE descendant_id = :id OR ancestor_id = :id"),
+        {"id": cat_id},
+    )
+
+
+def rebuild_category_closure(conn):
+    """Recompute category_closure from categories.parent_id. Accepts a Session or Connection."""
+    conn.execute(text("DELETE FROM category_closure"))
+    conn.execute(text(
+        "WITH RECURSIVE walk(ancestor_id, descendant_id, depth) AS ("
+        "    SELECT id, id, 0 FROM categories"
+        "    UNION ALL"
+        "    SELECT walk.ancestor_id, c.id, walk.depth + 1"
+        "    FROM walk JOIN categories c ON c.parent_id = walk.descendant_id"
+        ") "
+        "INSERT INTO category_closure (ancestor_id, descendant_id, depth) "
+        "SELECT ancestor_id, descendant_id, depth FROM walk"
+    ))
@@ -1,60 +1,65 @@
-import calendar
+import re
+import time
 from datetime import date, datetime, timedelta
 
+import pandas as pd
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import func
+from sqlalchemy import (
+    String,
+    and_,
+    case,
+    column,
+    func,
+    insert,
+    literal_column,
+    or_,
+    select,
+    table,
+    text,
+    type_coerce,
+)
+from sqlalchemy.orm import aliased
 
+from .category_tree import get_category_tree, invalidate_category_tree
+from .closure import add_closure_rows, delete_closure_rows
 from .database import get_session
-from .models import Budget, Category, RecurringTransaction, Transaction
+from .fingerprints import fingerprint_base, normalise_description, signed_cents
+from .merchant_rules import invalidate_rule_set, learn_rule, validate_rule
+from .money import from_cents, to_cents
+from .models import (
+    AppMeta,
+    Budget,
+    Category,
+    CategoryClosure,
+    MerchantRule,
+    MonthlyTotal,
+    RecurringTransaction,
+    Transaction,
+)
+from .read_cache import bump_generation, cached_read, invalidates_reads
+from .rollups import add_monthly_delta, apply_monthly_deltas
 
 
 def get_parent_categories(flow_type=None):
-    session = get_session()
-    try:
-        q = session.query(Category).filter(Category.parent_id.is_(None))
-        if flow_type:
-            q = q.filter(Category.flow_type == flow_type)
-        return [
-            {"id": c.id, "name": c.name, "flow_type": c.flow_type}
-            for c in q.order_by(Category.name).all()
-        ]
-    finally:
-        session.close()
+    return get_category_tree().parents(flow_type)
 
 
 def get_subcategories(parent_id):
-    session = get_session()
-    try:
-        cats = (
-            session.query(Category)
-            .filter(Category.parent_id == parent_id)
-            .order_by(Category.name)
-            .all()
-        )
-        return [{"id": c.id, "name": c.name, "flow_type": c.flow_type} for c in cats]
-    finally:
-        session.close()
+    return get_category_tree().subcategories(parent_id)
 
 
 def get_all_categories():
-    session = get_session()
-    try:
-        cats = session.query(Category).order_by(Category.flow_type, Category.name).all()
-        return [
-            {"id": c.id, "name": c.name, "parent_id": c.parent_id, "flow_type": c.flow_type}
-            for c in cats
-        ]
-    finally:
-        session.close()
+    return get_category_tree().all()
 
 
+@invalidates_reads
 def add_transaction(date, amount, category_id, description, notes="", source="manual"):
     session = get_session()
     try:
         cat = session.query(Category).filter(Category.id == category_id).first()
         tx = Transaction(
             date=date,
-            amount=amount,
+            amount_cents=to_cents(amount),
             category_id=category_id,
             description=description,
             notes=notes,
@@ -62,15 +67,33 @@ def add_transaction(date, amount, category_id, description, notes="", source="ma
             flow_type=cat.flow_type if cat else None,
         )
         session.add(tx)
+        deltas = {}
+        add_monthly_delta(deltas, tx.category_id, tx.flow_type, tx.date, tx.amount_cents)
+        apply_monthly_deltas(session, deltas)
         session.commit()
     finally:
         session.close()
 
 
+def _flow_type_of(tx):
+    """A transaction's flow type, falling back to its category's for legacy rows."""
+    if tx.flow_type:
+        return tx.flow_type
+    cat = get_category_tree().get(tx.category_id)
+    return cat["flow_type"] if cat else None
+
+
+@cached_read
 def get_transactions(start_date=None, end_date=None):
     session = get_session()
     try:
-        q = session.query(Transaction, Category).join(Category)
+        path, top = aliased(CategoryClosure), aliased(Category)
+        q = (
+            session.query(Transaction, Category, top.name)
+            .join(Category, Transaction.category_id == Category.id)
+            .join(path, path.descendant_id == Category.id)
+            .join(top, and_(top.id == path.ancestor_id, top.parent_id.is_(None)))
+        )
         if start_date:
             q = q.filter(Transaction.date >= start_date)
         if end_date:
@@ -78,21 +101,17 @@ def get_transactions(start_date=None, end_date=None):
         rows = q.order_by(Transaction.date.desc()).all()
 
         result = []
-        for tx, cat in rows:
-            parent = (
-                session.query(Category).filter(Category.id == cat.parent_id).first()
-                if cat.parent_id
-                else None
-            )
+        for tx, cat, type_name in rows:
             result.append(
                 {
                     "id": tx.id,
                     "date": tx.date,
-                    "amount": tx.amount,
+                    "amount": from_cents(tx.amount_cents),
+                    "amount_cents": tx.amount_cents,
                     "description": tx.description or "",
                     "notes": tx.notes or "",
                     "subtype": cat.name,
-                    "type": parent.name if parent else cat.name,
+                    "type": type_name,
                     "flow_type": tx.flow_type or cat.flow_type,
                     "category_id": tx.category_id,
                     "source": tx.source or "manual",
@@ -103,66 +122,604 @@ def get_transactions(start_date=None, end_date=None):
         session.close()
 
 
+# Arrow-backed strings are far more compact than Python str objects; pyarrow
+# ships with Streamlit, but fall back to pandas' own string dtype without it.
+try:
+    import pyarrow  # noqa: F401
+    _TEXT_DTYPE = "string[pyarrow]"
+except ImportError:
+    _TEXT_DTYPE = "string"
+
+TRANSACTION_FRAME_COLUMNS = [
+    "id", "date", "amount", "amount_cents", "description", "notes",
+    "subtype", "type", "flow_type", "category_id", "source",
+]
+_CATEGORICAL_COLUMNS = ("type", "subtype", "flow_type", "source")
+
+
+def _transaction_frame_select(columns):
+    """SELECT producing the requested frame columns (amount is derived from amount_cents)."""
+    path, top = aliased(CategoryClosure), aliased(Category)
+    exprs = {
+        "id": Transaction.id,
+        # Raw ISO text: pandas parses the whole column at once, much faster than
+        # SQLAlchemy converting every value to a datetime object
+        "date": type_coerce(Transaction.date, String),
+        "amount_cents": Transaction.amount_cents,
+        "description": func.coalesce(Transaction.description, ""),
+        "notes": func.coalesce(Transaction.notes, ""),
+        "subtype": Category.name,
+        "type": top.name,
+        "flow_type": func.coalesce(Transaction.flow_type, Category.flow_type),
+        "category_id": Transaction.category_id,
+        "source": func.coalesce(Transaction.source, "manual"),
+    }
+    wanted = [c for c in exprs if c in columns or (c == "amount_cents" and "amount" in columns)]
+    return (
+        select(*[exprs[c].label(c) for c in wanted])
+        .select_from(Transaction)
+        .join(Category, Transaction.category_id == Category.id)
+        # "type" is the top-level category, however deep the subcategory sits
+        .join(path, path.descendant_id == Category.id)
+        .join(top, and_(top.id == path.ancestor_id, top.parent_id.is_(None)))
+    )
+
+
+def _read_transaction_frame(q, columns):
+    """Execute a _transaction_frame_select() query and return it as a typed DataFrame."""
+    session = get_session()
+    try:
+        # Core execution: plain tuples, no ORM row wrapping
+        result = session.connection().execute(q)
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    finally:
+        session.close()
+
+    if "date" in df:
+        df["date"] = pd.to_datetime(df["date"], format="ISO8601")
+    if "amount_cents" in df:
+        df["amount_cents"] = df["amount_cents"].astype("int64")
+        if "amount" in columns:
+            df["amount"] = df["amount_cents"] / 100
+    for col in ("id", "category_id"):
+        if col in df:
+            df[col] = df[col].astype("int64")
+    for col in _CATEGORICAL_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype("category")
+    for col in ("description", "notes"):
+        if col in df:
+            df[col] = df[col].astype(_TEXT_DTYPE)
+    return df[[c for c in TRANSACTION_FRAME_COLUMNS if c in columns]]
+
+
+@cached_read
+def get_transactions_frame(start_date=None, end_date=None, columns=None):
+    """
+    Transactions as a typed DataFrame, newest first.
+
+    Reads rows straight into columns instead of building a dict per row:
+    date is datetime64, amount_cents int64, type/subtype/flow_type/source are
+    categoricals and description/notes are Arrow-backed strings.
+    `columns` limits the result to a subset of TRANSACTION_FRAME_COLUMNS.
+    """
+    columns = list(columns) if columns else TRANSACTION_FRAME_COLUMNS
+    q = _transaction_frame_select(columns)
+    if start_date:
+        q = q.where(Transaction.date >= start_date)
+    if end_date:
+        q = q.where(Transaction.date <= end_date)
+    q = q.order_by(Transaction.date.desc(), Transaction.id.desc())
+    return _read_transaction_frame(q, columns)
+
+
+# ---------------------------------------------------------------------------
+# Full-text search (transactions_fts, see migration 4)
+# ---------------------------------------------------------------------------
+
+_fts = table("transactions_fts", column("rowid"))
+_FTS_TERM = re.compile(r'"([^"]*)"|(\S+)')
+_fts_enabled = None
+
+
+def _has_fts():
+    """Whether this database has the FTS5 index (checked once per process)."""
+    global _fts_enabled
+    if _fts_enabled is None:
+        session = get_session()
+        try:
+            _fts_enabled = session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'")
+            ).first() is not None
+        finally:
+            session.close()
+    return _fts_enabled
+
+
+def _fts_query(search):
+    """
+    Turn search box text into a safe FTS5 query.
+
+    "quoted text" is matched as a phrase; every other word is a prefix match,
+    so `wool "joffre st"` finds "Woolworths Metro" and "Joffre St insurance".
+    Returns "" when there is nothing searchable.
+    """
+    parts = []
+    for phrase, word in _FTS_TERM.findall(search):
+        if phrase:
+            tokens = re.findall(r"\w+", phrase)
+            if tokens:
+                parts.append('"' + " ".join(tokens) + '"')
+        else:
+            parts.extend(f'"{token}"*' for token in re.findall(r"\w+", word))
+    return " ".join(parts)
+
+
+def _fts_match(match):
+    return literal_column("transactions_fts").op("MATCH")(match)
+
+
+@cached_read
+def search_transactions(search, limit=50, columns=None, **filters):
+    """
+    Transactions whose description or notes match `search`, best match first.
+
+    Supports prefix words and "quoted phrases" (see _fts_query). Ranking is
+    FTS5's bm25 with description weighted above notes. Accepts the same
+    filters as get_transaction_totals() apart from search. Without the FTS5
+    index, falls back to a LIKE scan ordered by date.
+    """
+    columns = list(columns) if columns else TRANSACTION_FRAME_COLUMNS
+    match = _fts_query(search)
+    q = _filter_transactions(_transaction_frame_select(columns), **filters)
+    if match and _has_fts():
+        q = (
+            q.join(_fts, _fts.c.rowid == Transaction.id)
+            .where(_fts_match(match))
+            .order_by(func.bm25(literal_column("transactions_fts"), 10.0, 1.0))
+        )
+    else:
+        q = _filter_transactions(q, search=search).order_by(
+            Transaction.date.desc(), Transaction.id.desc()
+        )
+    if limit:
+        q = q.limit(limit)
+    return _read_transaction_frame(q, columns)
+
+
+def _like_pattern(text):
+    """`%text%` for a LIKE with escape "\\", so % and _ in the search match themselves."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _filter_transactions(q, start_date=None, end_date=None, flow_types=None, sources=None,
+                         category_ids=None, search=None):
+    """Apply the Transactions page filters to a query that already joins Category."""
+    if start_date:
+        q = q.where(Transaction.date >= start_date)
+    if end_date:
+        q = q.where(Transaction.date <= end_date)
+    if flow_types:
+        q = q.where(func.coalesce(Transaction.flow_type, Category.flow_type).in_(flow_types))
+    if sources:
+        q = q.where(func.coalesce(Transaction.source, "manual").in_(sources))
+    if category_ids:
+        q = q.where(Transaction.category_id.in_(category_ids))
+    if search:
+        match = _fts_query(search)
+        if match and _has_fts():
+            q = q.where(Transaction.id.in_(select(_fts.c.rowid).where(_fts_match(match))))
+        else:
+            pattern = _like_pattern(search)
+            q = q.where(or_(
+                Transaction.description.ilike(pattern, escape="\\"),
+                Transaction.notes.ilike(pattern, escape="\\"),
+            ))
+    return q
+
+
+@cached_read
+def get_transactions_page(after=None, limit=50, columns=None, **filters):
+    """
+    One page of filtered transactions, newest first, using keyset pagination.
+
+    `after` is the cursor returned with the previous page: the (date, id) of
+    its last row. Only rows strictly older than it are read, so every page
+    costs the same however deep into the history it is. limit=None returns
+    every matching row. Filters are those accepted by get_transaction_totals().
+
+    Returns (frame, next_cursor); next_cursor is None on the last page.
+    """
+    columns = list(columns) if columns else TRANSACTION_FRAME_COLUMNS
+    q = _filter_transactions(_transaction_frame_select(columns + ["id", "date"]), **filters)
+    if after:
+        after_date, after_id = after
+        q = q.where(
+            (Transaction.date < after_date)
+            | ((Transaction.date == after_date) & (Transaction.id < after_id))
+        )
+    q = q.order_by(Transaction.date.desc(), Transaction.id.desc())
+    if limit:
+        # One extra row tells us whether there is another page
+        q = q.limit(limit + 1)
+
+    df = _read_transaction_frame(q, columns + ["id", "date"])
+    next_cursor = None
+    if limit and len(df) > limit:
+        df = df.iloc[:limit]
+        last = df.iloc[-1]
+        next_cursor = (last["date"].to_pydatetime(), int(last["id"]))
+    return df[[c for c in TRANSACTION_FRAME_COLUMNS if c in columns]], next_cursor
+
+
+@cached_read
+def get_transaction_totals(start_date=None, end_date=None, flow_types=None, sources=None,
+                           category_ids=None, search=None):
+    """
+    SQL-side totals for a filtered transaction set.
+
+    Returns {"count", "income_cents", "expense_cents"}.
+    """
+    flow = func.coalesce(Transaction.flow_type, Category.flow_type)
+    q = (
+        select(flow, func.count(Transaction.id), func.sum(Transaction.amount_cents))
+        .select_from(Transaction)
+        .join(Category, Transaction.category_id == Category.id)
+    )
+    q = _filter_transactions(
+        q, start_date, end_date, flow_types, sources, category_ids, search
+    ).group_by(flow)
+
+    session = get_session()
+    try:
+        rows = session.connection().execute(q).fetchall()
+    finally:
+        session.close()
+    totals = {"count": 0, "income_cents": 0, "expense_cents": 0}
+    for flow_type, count, cents in rows:
+        totals["count"] += count
+        if flow_type in ("income", "expense"):
+            totals[f"{flow_type}_cents"] = cents or 0
+    return totals
+
+
+@invalidates_reads
 def delete_transaction(tx_id):
     session = get_session()
     try:
         tx = session.query(Transaction).filter(Transaction.id == tx_id).first()
         if tx:
+            deltas = {}
+            add_monthly_delta(deltas, tx.category_id, _flow_type_of(tx), tx.date, -tx.amount_cents, -1)
             session.delete(tx)
+            apply_monthly_deltas(session, deltas)
             session.commit()
     finally:
         session.close()
 
 
 def update_transaction(tx_id, date, amount, category_id, description, notes):
+    """
+    Moving a transaction to another category also teaches a merchant rule for
+    its description. A one-row apply_transaction_edits(), which invalidates reads.
+    """
+    apply_transaction_edits(updates=[{
+        "id": tx_id,
+        "date": date,
+        "amount": amount,
+        "category_id": category_id,
+        "description": description,
+        "notes": notes,
+    }])
+
+
+# Fields apply_transaction_edits() accepts in an update
+_EDITABLE_FIELDS = ("date", "amount", "category_id", "description", "notes")
+
+
+@invalidates_reads
+def apply_transaction_edits(updates=(), deletes=()):
+    """
+    Apply a batch of edits (e.g. from the Transactions grid) in one database transaction.
+
+    `updates` is a list of dicts with "id" plus any of _EDITABLE_FIELDS;
+    `deletes` is a list of ids, and wins over an update to the same id. The
+    monthly rollups get one net delta for the whole batch, a transaction moved
+    to another category takes that category's flow type and teaches a
+    merchant rule for its description, and nothing is written if any part fails.
+    Returns {"updated": n, "deleted": n}.
+    """
+    for u in updates:
+        unknown = set(u) - {"id", *_EDITABLE_FIELDS}
+        if unknown:
+            raise ValueError(f"Cannot edit {', '.join(sorted(unknown))}")
+    delete_ids = {int(i) for i in deletes}
+    updates = {int(u["id"]): u for u in updates if int(u["id"]) not in delete_ids}
+    ids = list(delete_ids | set(updates))
+    tree = get_category_tree()
     session = get_session()
+    recategorised = False
     try:
-        tx = session.query(Transaction).filter(Transaction.id == tx_id).first()
-        if tx:
-            tx.date = date
-            tx.amount = amount
-            tx.category_id = category_id
-            tx.description = description
-            tx.notes = notes
-            session.commit()
+        txs = []
+        for i in range(0, len(ids), _LOOKUP_BATCH):
+            txs.extend(session.query(Transaction).filter(Transaction.id.in_(ids[i:i + _LOOKUP_BATCH])))
+
+        deltas = {}
+        updated = deleted = 0
+        for tx in txs:
+            add_monthly_delta(deltas, tx.category_id, _flow_type_of(tx), tx.date, -tx.amount_cents, -1)
+            if tx.id in delete_ids:
+                session.delete(tx)
+                deleted += 1
+                continue
+            changes = updates[tx.id]
+            if "category_id" in changes and changes["category_id"] != tx.category_id:
+                tx.category_id = changes["category_id"]
+                cat = tree.get(tx.category_id)
+                tx.flow_type = cat["flow_type"] if cat else tx.flow_type
+                learn_rule(session, changes.get("description", tx.description), tx.category_id)
+                recategorised = True
+            if "date" in changes:
+                tx.date = changes["date"]
+            if "amount" in changes:
+                tx.amount_cents = to_cents(changes["amount"])
+            if "description" in changes:
+                tx.description = changes["description"]
+            if "notes" in changes:
+                tx.notes = changes["notes"]
+            add_monthly_delta(deltas, tx.category_id, _flow_type_of(tx), tx.date, tx.amount_cents)
+            updated += 1
+        apply_monthly_deltas(session, deltas)
+        session.commit()
     finally:
         session.close()
+    if recategorised:
+        invalidate_rule_set()
+    return {"updated": updated, "deleted": deleted}
 
 
+@invalidates_reads
 def add_category(name, flow_type, parent_id=None):
     session = get_session()
     try:
         cat = Category(name=name, flow_type=flow_type, parent_id=parent_id)
         session.add(cat)
+        session.flush()
+        add_closure_rows(session, cat.id, parent_id)
         session.commit()
     finally:
         session.close()
+    invalidate_category_tree()
+
+
+def _month_start(d):
+    return datetime(d.year, d.month, 1)
+
+
+def _next_month_start(d):
+    return _month_start(d) + relativedelta(months=1)
+
+
+def _rollup_span(start_date, end_date):
+    """
+    Split [start_date, end_date] into the whole calendar months the
+    monthly_totals rollup can answer and the partial months at either edge.
+
+    Returns (use_rollup, full_from, full_to, edges): read the rollup for
+    [full_from, full_to) (either bound None = open) when use_rollup is set,
+    and raw transactions for each (lo, hi) range in edges.
+    """
+    full_from = None if start_date is None else (
+        start_date if start_date == _month_start(start_date) else _next_month_start(start_date)
+    )
+    full_to = None if end_date is None else (
+        _next_month_start(end_date)
+        if end_date >= _next_month_start(end_date) - timedelta(microseconds=1)
+        else _month_start(end_date)
+    )
+    use_rollup = full_from is None or full_to is None or full_from < full_to
+    edges = []
+    if not use_rollup:
+        edges.append((start_date, end_date))
+    else:
+        if start_date is not None and full_from != start_date:
+            edges.append((start_date, full_from - timedelta(microseconds=1)))
+        if end_date is not None and full_to <= end_date:
+            edges.append((full_to, end_date))
+    return use_rollup, full_from, full_to, edges
+
+
+def _filter_rollup_period(q, full_from, full_to):
+    period = MonthlyTotal.year * 100 + MonthlyTotal.month
+    if full_from is not None:
+        q = q.filter(period >= full_from.year * 100 + full_from.month)
+    if full_to is not None:
+        q = q.filter(period < full_to.year * 100 + full_to.month)
+    return q
+
+
+@cached_read
+def get_monthly_flow_totals(start_date=None, end_date=None):
+    """
+    Income/expense totals per month as a DataFrame (month "YYYY-MM", flow_type, total_cents).
+
+    Whole months inside the range are read from the monthly_totals rollup;
+    only the partial months at either edge of the range touch raw transactions.
+    """
+    flow = func.coalesce(Transaction.flow_type, Category.flow_type)
+    use_rollup, full_from, full_to, edges = _rollup_span(start_date, end_date)
+    session = get_session()
+    try:
+        totals = {}
+        if use_rollup:
+            q = session.query(
+                MonthlyTotal.year, MonthlyTotal.month, MonthlyTotal.flow_type,
+                func.sum(MonthlyTotal.total_cents),
+            )
+            q = _filter_rollup_period(q, full_from, full_to)
+            for y, m, flow_type, cents in q.group_by(MonthlyTotal.year, MonthlyTotal.month, MonthlyTotal.flow_type):
+                totals[(f"{y:04d}-{m:02d}", flow_type)] = cents
+
+        # Partial months at the edges, straight from transactions
+        for lo, hi in edges:
+            month = func.strftime("%Y-%m", Transaction.date)
+            rows = (
+                session.query(month, flow, func.sum(Transaction.amount_cents))
+                .join(Category, Transaction.category_id == Category.id)
+                .filter(Transaction.date >= lo, Transaction.date <= hi)
+                .group_by(month, flow)
+                .all()
+            )
+            for m, flow_type, cents in rows:
+                totals[(m, flow_type)] = totals.get((m, flow_type), 0) + cents
+    finally:
+        session.close()
+
+    df = pd.DataFrame(
+        [(m, f, c) for (m, f), c in sorted(totals.items())],
+        columns=["month", "flow_type", "total_cents"],
+    )
+    df["total_cents"] = df["total_cents"].astype("int64")
+    return df
+
+
+def get_balance(as_of=None):
+    """Net of all income minus all expenses up to `as_of` (default: end of today), in cents."""
+    # A fixed end of day rather than now(), so repeat calls share a cached read
+    totals = get_monthly_flow_totals(None, as_of or datetime.combine(date.today(), datetime.max.time()))
+    signed = totals["total_cents"].where(totals["flow_type"] == "income", -totals["total_cents"])
+    return int(signed.sum())
+
+
+DASHBOARD_TOP_N = 10
+
+
+@cached_read
+def get_dashboard_summary(start_date=None, end_date=None, top_n=DASHBOARD_TOP_N):
+    """
+    Everything the Dashboard shows for a date range, aggregated in SQL.
+
+    Per-category figures come from the monthly_totals rollup, with raw
+    transactions only for partial months at the edges (see _rollup_span);
+    the daily net series is one GROUP BY day. The result is a few rows per
+    month, category and day however long the range:
+
+        income_cents, expense_cents, net_cents, tx_count
+        monthly:            DataFrame (month, flow_type, total_cents)
+        expense_by_type:    DataFrame (type, total_cents), largest first
+        daily_net:          DataFrame (date, net_cents), oldest first
+        top_subcategories:  DataFrame (type, subtype, total_cents), the top_n largest expenses
+    """
+    flow = func.coalesce(Transaction.flow_type, Category.flow_type)
+    path, top = aliased(CategoryClosure), aliased(Category)
+    use_rollup, full_from, full_to, edges = _rollup_span(start_date, end_date)
+    session = get_session()
+    try:
+        # (type, subtype, flow_type) → [cents, count]
+        by_category = {}
+        queries = []
+        if use_rollup:
+            q = (
+                session.query(
+                    top.name, Category.name, MonthlyTotal.flow_type,
+                    func.sum(MonthlyTotal.total_cents), func.sum(MonthlyTotal.tx_count),
+                )
+                .join(Category, MonthlyTotal.category_id == Category.id)
+                .join(path, path.descendant_id == Category.id)
+                .join(top, and_(top.id == path.ancestor_id, top.parent_id.is_(None)))
+            )
+            queries.append(
+                _filter_rollup_period(q, full_from, full_to)
+                .group_by(top.name, Category.name, MonthlyTotal.flow_type)
+            )
+        for lo, hi in edges:
+            queries.append(
+                session.query(top.name, Category.name, flow, func.sum(Transaction.amount_cents), func.count())
+                .join(Category, Transaction.category_id == Category.id)
+                .join(path, path.descendant_id == Category.id)
+                .join(top, and_(top.id == path.ancestor_id, top.parent_id.is_(None)))
+                .filter(Transaction.date >= lo, Transaction.date <= hi)
+                .group_by(top.name, Category.name, flow)
+            )
+        for q in queries:
+            for type_name, subtype, flow_type, cents, count in q:
+                cell = by_category.setdefault((type_name, subtype, flow_type), [0, 0])
+                cell[0] += cents
+                cell[1] += count
+
+        day = func.date(Transaction.date)
+        q = (
+            session.query(day, func.sum(case((flow == "income", Transaction.amount_cents), else_=-Transaction.amount_cents)))
+            .join(Category, Transaction.category_id == Category.id)
+        )
+        if start_date:
+            q = q.filter(Transaction.date >= start_date)
+        if end_date:
+            q = q.filter(Transaction.date <= end_date)
+        daily = q.group_by(day).order_by(day).all()
+    finally:
+        session.close()
+
+    categories = pd.DataFrame(
+        [(t, s, f, cents, count) for (t, s, f), (cents, count) in by_category.items()],
+        columns=["type", "subtype", "flow_type", "total_cents", "tx_count"],
+    ).astype({"total_cents": "int64", "tx_count": "int64"})
+    expenses = categories[categories["flow_type"] == "expense"]
+    income_cents = int(categories.loc[categories["flow_type"] == "income", "total_cents"].sum())
+    expense_cents = int(expenses["total_cents"].sum())
+
+    daily_net = pd.DataFrame(daily, columns=["date", "net_cents"])
+    daily_net["date"] = pd.to_datetime(daily_net["date"])
+    daily_net["net_cents"] = daily_net["net_cents"].astype("int64")
+
+    return {
+        "income_cents": income_cents,
+        "expense_cents": expense_cents,
+        "net_cents": income_cents - expense_cents,
+        "tx_count": int(categories["tx_count"].sum()),
+        "monthly": get_monthly_flow_totals(start_date, end_date),
+        "expense_by_type": (
+            expenses.groupby("type", as_index=False)["total_cents"].sum()
+            .sort_values("total_cents", ascending=False, ignore_index=True)
+        ),
+        "daily_net": daily_net,
+        "top_subcategories": (
+            expenses[["type", "subtype", "total_cents"]]
+            .sort_values("total_cents", ascending=False, ignore_index=True)
+            .head(top_n)
+        ),
+    }
 
 
 # ---------------------------------------------------------------------------
 # Budget functions
 # ---------------------------------------------------------------------------
 
+@cached_read
 def get_budgets():
     session = get_session()
     try:
-        rows = session.query(Budget, Category).join(Category, Budget.category_id == Category.id).all()
+        path, top = aliased(CategoryClosure), aliased(Category)
+        rows = (
+            session.query(Budget, Category, top.name)
+            .join(Category, Budget.category_id == Category.id)
+            .join(path, path.descendant_id == Category.id)
+            .join(top, and_(top.id == path.ancestor_id, top.parent_id.is_(None)))
+            .all()
+        )
         result = []
-        for b, cat in rows:
-            parent = (
-                session.query(Category).filter(Category.id == cat.parent_id).first()
-                if cat.parent_id
-                else None
-            )
+        for b, cat, type_name in rows:
             result.append({
                 "id": b.id,
                 "category_id": b.category_id,
                 "category": cat.name,
-                "type": parent.name if parent else cat.name,
+                "type": type_name,
                 "is_subtype": cat.parent_id is not None,
                 "flow_type": cat.flow_type,
-                "monthly_amount": b.monthly_amount,
-                "annual_amount": b.monthly_amount * 12,
+                "monthly_amount": from_cents(b.monthly_amount_cents),
+                "monthly_cents": b.monthly_amount_cents,
+                "annual_amount": from_cents(b.monthly_amount_cents * 12),
                 "notes": b.notes or "",
             })
         return sorted(result, key=lambda x: (x["flow_type"], x["type"], x["category"]))
@@ -170,20 +727,24 @@ def get_budgets():
         session.close()
 
 
+@invalidates_reads
 def set_budget(category_id, monthly_amount, notes=""):
     session = get_session()
     try:
         existing = session.query(Budget).filter(Budget.category_id == category_id).first()
         if existing:
-            existing.monthly_amount = monthly_amount
+            existing.monthly_amount_cents = to_cents(monthly_amount)
             existing.notes = notes
         else:
-            session.add(Budget(category_id=category_id, monthly_amount=monthly_amount, notes=notes))
+            session.add(Budget(
+                category_id=category_id, monthly_amount_cents=to_cents(monthly_amount), notes=notes
+            ))
         session.commit()
     finally:
         session.close()
 
 
+@invalidates_reads
 def delete_budget(budget_id):
     session = get_session()
     try:
@@ -195,79 +756,143 @@ def delete_budget(budget_id):
         session.close()
 
 
-def get_budget_vs_actual(year, month):
+def _budget_period_figures(budget_cents, month, monthly_actuals, ytd_actuals, all_ids, subcats):
+    """Monthly, YTD and projected figures for one budget in one period (all sums in cents)."""
+    monthly_cents = sum(monthly_actuals.get(cid, 0) for cid in all_ids)
+    ytd_cents = sum(ytd_actuals.get(cid, 0) for cid in all_ids)
+    ytd_budget_cents = budget_cents * month
+    projected = from_cents(ytd_cents * 12 / month) if month > 0 and ytd_cents > 0 else 0.0
+
+    # Per-subcategory breakdown (only include subcats that have activity)
+    subcategories = [
+        {
+            "name": s["name"],
+            "monthly_actual": from_cents(monthly_actuals.get(s["id"], 0)),
+            "ytd_actual": from_cents(ytd_actuals.get(s["id"], 0)),
+        }
+        for s in subcats
+        if monthly_actuals.get(s["id"], 0) > 0 or ytd_actuals.get(s["id"], 0) > 0
+    ]
+
+    return {
+        # Monthly
+        "monthly_budget": from_cents(budget_cents),
+        "monthly_actual": from_cents(monthly_cents),
+        "monthly_remaining": from_cents(budget_cents - monthly_cents),
+        "monthly_pct": (monthly_cents / budget_cents * 100) if budget_cents > 0 else 0.0,
+        # Annual / YTD
+        "annual_budget": from_cents(budget_cents * 12),
+        "ytd_budget": from_cents(ytd_budget_cents),
+        "ytd_actual": from_cents(ytd_cents),
+        "ytd_diff": from_cents(ytd_cents - ytd_budget_cents),
+        "projected_annual": projected,
+        # Exact cents for callers that total across budgets
+        "monthly_budget_cents": budget_cents,
+        "monthly_actual_cents": monthly_cents,
+        "annual_budget_cents": budget_cents * 12,
+        "ytd_actual_cents": ytd_cents,
+        # Subcategory detail
+        "subcategories": subcategories,
+    }
+
+
+@cached_read
+def get_budget_matrix(periods):
+    """
+    Budget vs actual for several months at once.
+
+    `periods` is a list of (year, month). Actuals for every budget, every
+    subcategory under it and every month of the years involved come from one
+    grouped query over monthly_totals, joined through category_closure.
+    Budgets are set at the top-level (parent) category and actuals are summed
+    across ALL categories beneath it, however deeply nested; the subcategory
+    breakdown is by direct subcategory, each including its own descendants.
+
+    Returns a list of budgets sorted by (flow_type, category), each with
+    category_id, category, flow_type and "periods": {(year, month): figures},
+    where figures has the same keys as a get_budget_vs_actual() row.
+    """
+    periods = [(int(y), int(m)) for y, m in periods]
+    if not periods:
+        return []
+    years = sorted({y for y, _ in periods})
+    last_month = max(m for _, m in periods)
+
     session = get_session()
     try:
-        month_start = datetime(year, month, 1)
-        _, last_day = calendar.monthrange(year, month)
-        month_end = datetime(year, month, last_day, 23, 59, 59)
-        year_start = datetime(year, 1, 1)
-
-        # Aggregate actuals by category
-        monthly_actuals = dict(
-            session.query(Transaction.category_id, func.sum(Transaction.amount))
-            .filter(Transaction.date >= month_start, Transaction.date <= month_end)
-            .group_by(Transaction.category_id)
+        budgets = (
+            session.query(Budget.id, Budget.monthly_amount_cents, Category.id, Category.name, Category.flow_type)
+            .join(Category, Budget.category_id == Category.id)
             .all()
         )
-        ytd_actuals = dict(
-            session.query(Transaction.category_id, func.sum(Transaction.amount))
-            .filter(Transaction.date >= year_start, Transaction.date <= month_end)
-            .group_by(Transaction.category_id)
+        if not budgets:
+            return []
+
+        # (budget_id, branch_id, year, month) → cents. Every category under the
+        # budget, at any depth, is found through the closure table (reach) and
+        # credited to the budget's direct subcategory on its path (branch), or
+        # to the budget category itself for its own transactions.
+        reach, branch = aliased(CategoryClosure), aliased(CategoryClosure)
+        branch_id = func.coalesce(branch.ancestor_id, Budget.category_id)
+        actuals = (
+            session.query(
+                Budget.id, branch_id, MonthlyTotal.year, MonthlyTotal.month,
+                func.sum(MonthlyTotal.total_cents),
+            )
+            .join(reach, reach.ancestor_id == Budget.category_id)
+            .join(MonthlyTotal, MonthlyTotal.category_id == reach.descendant_id)
+            .outerjoin(branch, and_(
+                branch.descendant_id == reach.descendant_id, branch.depth == reach.depth - 1
+            ))
+            .filter(MonthlyTotal.year.in_(years), MonthlyTotal.month <= last_month)
+            .group_by(Budget.id, branch_id, MonthlyTotal.year, MonthlyTotal.month)
             .all()
         )
+    finally:
+        session.close()
 
-        # Budgets are set at the top-level (parent) category.
-        # Actuals are summed across ALL subcategories under each parent.
-        rows = session.query(Budget, Category).join(Category, Budget.category_id == Category.id).all()
-        result = []
-        for b, cat in rows:
-            subcats = (
-                session.query(Category)
-                .filter(Category.parent_id == cat.id)
-                .order_by(Category.name)
-                .all()
+    by_budget = {}
+    for budget_id, branch_cat_id, year, month, cents in actuals:
+        by_budget.setdefault(budget_id, {})[(branch_cat_id, year, month)] = cents
+
+    tree = get_category_tree()
+    result = []
+    for budget_id, budget_cents, cat_id, cat_name, flow_type in budgets:
+        subcats = tree.subcategories(cat_id)
+        all_ids = [cat_id] + [sc["id"] for sc in subcats]
+        cells = by_budget.get(budget_id, {})
+        figures = {}
+        for year, month in periods:
+            monthly_actuals, ytd_actuals = {}, {}
+            for (cid, y, m), cents in cells.items():
+                if y != year or m > month:
+                    continue
+                ytd_actuals[cid] = ytd_actuals.get(cid, 0) + cents
+                if m == month:
+                    monthly_actuals[cid] = cents
+            figures[(year, month)] = _budget_period_figures(
+                budget_cents, month, monthly_actuals, ytd_actuals, all_ids, subcats
             )
-            all_ids = [cat.id] + [s.id for s in subcats]
+        result.append({
+            "category_id": cat_id,
+            "category": cat_name,
+            "flow_type": flow_type,
+            "periods": figures,
+        })
+    return sorted(result, key=lambda x: (x["flow_type"], x["category"]))
 
-            monthly_actual = sum(monthly_actuals.get(cid, 0.0) for cid in all_ids)
-            ytd_actual = sum(ytd_actuals.get(cid, 0.0) for cid in all_ids)
-            ytd_budget = b.monthly_amount * month
-            annual_budget = b.monthly_amount * 12
-            projected = (ytd_actual / month * 12) if month > 0 and ytd_actual > 0 else 0.0
 
-            # Per-subcategory breakdown (only include subcats that have activity)
-            subcategories = [
-                {
-                    "name": s.name,
-                    "monthly_actual": monthly_actuals.get(s.id, 0.0),
-                    "ytd_actual": ytd_actuals.get(s.id, 0.0),
-                }
-                for s in subcats
-                if monthly_actuals.get(s.id, 0.0) > 0 or ytd_actuals.get(s.id, 0.0) > 0
-            ]
-
-            result.append({
-                "category_id": cat.id,
-                "category": cat.name,
-                "flow_type": cat.flow_type,
-                # Monthly
-                "monthly_budget": b.monthly_amount,
-                "monthly_actual": monthly_actual,
-                "monthly_remaining": b.monthly_amount - monthly_actual,
-                "monthly_pct": (monthly_actual / b.monthly_amount * 100) if b.monthly_amount > 0 else 0.0,
-                # Annual / YTD
-                "annual_budget": annual_budget,
-                "ytd_budget": ytd_budget,
-                "ytd_actual": ytd_actual,
-                "ytd_diff": ytd_actual - ytd_budget,
-                "projected_annual": projected,
-                # Subcategory detail
-                "subcategories": subcategories,
-            })
-        return sorted(result, key=lambda x: (x["flow_type"], x["category"]))
-    finally:
-        session.close()
+@cached_read
+def get_budget_vs_actual(year, month):
+    return [
+        {
+            "category_id": b["category_id"],
+            "category": b["category"],
+            "flow_type": b["flow_type"],
+            **b["periods"][(year, month)],
+        }
+        for b in get_budget_matrix([(year, month)])
+    ]
 
 
 # ---------------------------------------------------------------------------
@@ -289,11 +914,39 @@ def _next_date(d, frequency):
     return d + timedelta(days=30)
 
 
+def _due_dates(rec, today):
+    """
+    Expand one schedule's overdue occurrences, exactly as stepping _next_date would.
+
+    Returns (dates, next_run, ended): dates up to today, the date of the next
+    occurrence, and whether the schedule passed its end_date.
+    """
+    end = rec.end_date.date() if rec.end_date else None
+    run_date = rec.next_run_date.date()
+    dates = []
+    while run_date <= today:
+        if end and run_date > end:
+            return dates, run_date, True
+        dates.append(run_date)
+        run_date = _next_date(run_date, rec.frequency)
+    return dates, run_date, False
+
+
 def process_recurring_transactions():
-    """Create any overdue recurring transactions. Returns count created."""
+    """
+    Create any overdue recurring transactions.
+
+    All due occurrences are expanded up front and written with one bulk
+    insert, so catching up after months offline costs a single round-trip.
+    Returns {"created": total rows, "schedules": [per-schedule counts],
+    "elapsed_s": seconds taken}.
+    """
+    started = time.perf_counter()
     session = get_session()
     today = date.today()
-    created = 0
+    rows = []
+    schedules = []
+    deltas = {}
     try:
         due = (
             session.query(RecurringTransaction)
@@ -303,54 +956,72 @@ def process_recurring_transactions():
             )
             .all()
         )
+        tree = get_category_tree()
         for rec in due:
-            run_date = rec.next_run_date.date()
-            while run_date <= today:
-                if rec.end_date and run_date > rec.end_date.date():
-                    rec.active = False
-                    break
-                cat = session.query(Category).filter(Category.id == rec.category_id).first()
-                session.add(Transaction(
-                    date=datetime.combine(run_date, datetime.min.time()),
-                    amount=rec.amount,
-                    category_id=rec.category_id,
-                    description=rec.description or f"Recurring ({rec.frequency})",
-                    notes=rec.notes or "",
-                    source="recurring",
-                    flow_type=cat.flow_type if cat else None,
-                ))
-                created += 1
-                run_date = _next_date(run_date, rec.frequency)
-            if rec.active:
-                rec.next_run_date = datetime.combine(run_date, datetime.min.time())
+            dates, next_run, ended = _due_dates(rec, today)
+            cat = tree.get(rec.category_id)
+            flow_type = cat["flow_type"] if cat else None
+            description = rec.description or f"Recurring ({rec.frequency})"
+            for run_date in dates:
+                when = datetime.combine(run_date, datetime.min.time())
+                rows.append({
+                    "date": when,
+                    "amount_cents": rec.amount_cents,
+                    "category_id": rec.category_id,
+                    "description": description,
+                    "notes": rec.notes or "",
+                    "source": "recurring",
+                    "flow_type": flow_type,
+                })
+                add_monthly_delta(deltas, rec.category_id, flow_type, when, rec.amount_cents)
+            if ended:
+                rec.active = False
+            else:
+                rec.next_run_date = datetime.combine(next_run, datetime.min.time())
+            schedules.append({
+                "id": rec.id,
+                "description": description,
+                "created": len(dates),
+                "ended": ended,
+            })
+        if rows:
+            session.execute(insert(Transaction), rows)
+        apply_monthly_deltas(session, deltas)
         session.commit()
-        return created
     finally:
         session.close()
+    # Runs at the start of every session; only a real change invalidates cached reads
+    if due:
+        bump_generation()
+    return {
+        "created": len(rows),
+        "schedules": schedules,
+        "elapsed_s": time.perf_counter() - started,
+    }
 
 
+@cached_read
 def get_recurring_transactions():
     session = get_session()
     try:
+        path, top = aliased(CategoryClosure), aliased(Category)
         rows = (
-            session.query(RecurringTransaction, Category)
-            .join(Category)
+            session.query(RecurringTransaction, Category, top.name)
+            .join(Category, RecurringTransaction.category_id == Category.id)
+            .join(path, path.descendant_id == Category.id)
+            .join(top, and_(top.id == path.ancestor_id, top.parent_id.is_(None)))
             .order_by(RecurringTransaction.active.desc(), RecurringTransaction.description)
             .all()
         )
         result = []
-        for rec, cat in rows:
-            parent = (
-                session.query(Category).filter(Category.id == cat.parent_id).first()
-                if cat.parent_id
-                else None
-            )
+        for rec, cat, type_name in rows:
             result.append({
                 "id": rec.id,
-                "amount": rec.amount,
+                "amount": from_cents(rec.amount_cents),
+                "amount_cents": rec.amount_cents,
                 "description": rec.description or "",
                 "category": cat.name,
-                "type": parent.name if parent else cat.name,
+                "type": type_name,
                 "flow_type": cat.flow_type,
                 "frequency": rec.frequency,
                 "start_date": rec.start_date.date(),
@@ -364,11 +1035,12 @@ def get_recurring_transactions():
         session.close()
 
 
+@invalidates_reads
 def add_recurring_transaction(amount, category_id, description, notes, frequency, start_date, end_date=None):
     session = get_session()
     try:
         session.add(RecurringTransaction(
-            amount=amount,
+            amount_cents=to_cents(amount),
             category_id=category_id,
             description=description,
             notes=notes,
@@ -383,6 +1055,7 @@ def add_recurring_transaction(amount, category_id, description, notes, frequency
         session.close()
 
 
+@invalidates_reads
 def toggle_recurring(rec_id):
     session = get_session()
     try:
@@ -395,6 +1068,7 @@ def toggle_recurring(rec_id):
         session.close()
 
 
+@invalidates_reads
 def delete_recurring(rec_id):
     session = get_session()
     try:
@@ -406,6 +1080,7 @@ def delete_recurring(rec_id):
         session.close()
 
 
+@invalidates_reads
 def delete_category(cat_id):
     session = get_session()
     try:
@@ -421,60 +1096,244 @@ def delete_category(cat_id):
 
         cat = session.query(Category).filter(Category.id == cat_id).first()
         if cat:
+            delete_closure_rows(session, cat.id)
+            session.query(MerchantRule).filter(MerchantRule.category_id == cat.id).delete()
             session.delete(cat)
             session.commit()
+            invalidate_category_tree()
+            invalidate_rule_set()
         return True, "Deleted successfully."
     finally:
         session.close()
 
 
+# ---------------------------------------------------------------------------
+# Merchant rule functions (see db/merchant_rules.py)
+# ---------------------------------------------------------------------------
+
+@cached_read
+def get_merchant_rules():
+    session = get_session()
+    try:
+        rules = (
+            session.query(MerchantRule, Category.name)
+            .join(Category, Category.id == MerchantRule.category_id)
+            .order_by(MerchantRule.match_type, MerchantRule.pattern)
+            .all()
+        )
+        return [
+            {
+                "id": r.id,
+                "match_type": r.match_type,
+                "pattern": r.pattern,
+                "category_id": r.category_id,
+                "category": name,
+                "priority": r.priority,
+                "source": r.source,
+            }
+            for r, name in rules
+        ]
+    finally:
+        session.close()
+
+
+@invalidates_reads
+def add_merchant_rule(match_type, pattern, category_id, priority=0):
+    """Add or replace a rule. Returns (success, message)."""
+    try:
+        pattern = validate_rule(match_type, pattern)
+    except ValueError as e:
+        return False, str(e)
+    session = get_session()
+    try:
+        rule = (
+            session.query(MerchantRule)
+            .filter(MerchantRule.match_type == match_type, MerchantRule.pattern == pattern)
+            .first()
+        )
+        if rule:
+            rule.category_id = category_id
+            rule.priority = priority
+            rule.source = "manual"
+        else:
+            session.add(MerchantRule(
+                match_type=match_type, pattern=pattern, category_id=category_id, priority=priority, source="manual"
+            ))
+        session.commit()
+    finally:
+        session.close()
+    invalidate_rule_set()
+    return True, "Rule saved."
+
+
+@invalidates_reads
+def delete_merchant_rule(rule_id):
+    session = get_session()
+    try:
+        session.query(MerchantRule).filter(MerchantRule.id == rule_id).delete()
+        session.commit()
+    finally:
+        session.close()
+    invalidate_rule_set()
+
+
 # ---------------------------------------------------------------------------
 # CSV import helpers
 # ---------------------------------------------------------------------------
 
 def build_subcat_name_map():
     """Returns {subcategory_name_lowercase: category_id} for all subcategories."""
+    return dict(get_category_tree().subcat_ids_by_name)
+
+
+def get_uncategorised_ids():
+    """Returns (expense_uncat_id, income_fallback_id) for rows that cannot be mapped."""
+    tree = get_category_tree()
+    expense_uncat = tree.find("Uncategorised", "expense")
+    income_other = tree.find("Other Income", "income")
+    return (
+        expense_uncat["id"] if expense_uncat else None,
+        income_other["id"] if income_other else None,
+    )
+
+
+IMPORT_CHUNK_SIZE = 5000
+# Fingerprints per IN (...) lookup, well under SQLite's bound-parameter limit
+_LOOKUP_BATCH = 900
+
+
+def _existing_fingerprints(session, fingerprints):
+    """The subset of `fingerprints` already stored, found through ux_transactions_fingerprint."""
+    fingerprints = [fp for fp in fingerprints if fp]
+    found = set()
+    for i in range(0, len(fingerprints), _LOOKUP_BATCH):
+        found.update(session.execute(
+            select(Transaction.fingerprint)
+            .where(Transaction.fingerprint.in_(fingerprints[i:i + _LOOKUP_BATCH]))
+        ).scalars())
+    return found
+
+
+def classify_import_rows(valid_rows):
+    """
+    Sort fingerprinted import rows (see db.fingerprints.assign_fingerprints)
+    against the ledger. Returns one status per row:
+
+        "duplicate" — the same bank row was imported before
+        "conflict"  — not imported before, but an imported row on the same day
+                      with the same description has a different amount
+        "new"       — anything else
+
+    One fingerprint lookup covers the batch; conflicts are checked only for
+    the remaining rows, against imported rows on their dates.
+    """
     session = get_session()
     try:
-        children = session.query(Category).filter(Category.parent_id.isnot(None)).all()
-        return {c.name.lower(): c.id for c in children}
+        existing = _existing_fingerprints(session, [r["fingerprint"] for r in valid_rows])
+        statuses = ["duplicate" if r["fingerprint"] in existing else "new" for r in valid_rows]
+
+        days = sorted({r["date"] for r, s in zip(valid_rows, statuses) if s == "new"})
+        same_day = {}
+        for i in range(0, len(days), _LOOKUP_BATCH):
+            for when, cents, flow_type, description in session.execute(
+                select(Transaction.date, Transaction.amount_cents, Transaction.flow_type, Transaction.description)
+                .where(Transaction.date.in_(days[i:i + _LOOKUP_BATCH]), Transaction.fingerprint.isnot(None))
+            ):
+                key = (when.date(), normalise_description(description))
+                same_day.setdefault(key, set()).add(signed_cents(cents, flow_type))
+
+        for i, row in enumerate(valid_rows):
+            if statuses[i] != "new":
+                continue
+            day, cents, description = fingerprint_base(
+                row["date"], signed_cents(to_cents(row["amount"]), row["flow_type"]), row["description"]
+            )
+            amounts = same_day.get((row["date"].date(), description))
+            if amounts and cents not in amounts:
+                statuses[i] = "conflict"
+        return statuses
     finally:
         session.close()
 
 
-def get_uncategorised_ids():
-    """Returns (expense_uncat_id, income_fallback_id) for rows that cannot be mapped."""
+@invalidates_reads
+def bulk_import_transactions(valid_rows, chunk_size=IMPORT_CHUNK_SIZE, progress=None, atomic=True, checkpoint=None):
+    """
+    Insert a list of pre-validated transaction dicts. Returns count inserted.
+
+    Rows carrying a "fingerprint" that is already in the ledger are skipped,
+    so re-importing an overlapping statement never duplicates rows. Rows go
+    in through a Core executemany, `chunk_size` rows at a time, and
+    `progress(done, total)` is called after each chunk. With `atomic` the
+    whole import is one transaction and either lands completely or not at
+    all; otherwise each chunk (with its monthly_totals deltas) is committed
+    as it goes, so a failure keeps the chunks already written.
+
+    `checkpoint` is an optional (import_key, rows_done) pair saved in the
+    same final commit as the rows, see get_import_checkpoint().
+    """
+    total = len(valid_rows)
+    chunk_size = max(1, chunk_size or total)
+    inserted = 0
     session = get_session()
     try:
-        expense_uncat = session.query(Category).filter(
-            Category.name == "Uncategorised", Category.flow_type == "expense"
-        ).first()
-        income_other = session.query(Category).filter(
-            Category.name == "Other Income", Category.flow_type == "income"
-        ).first()
-        return (
-            expense_uncat.id if expense_uncat else None,
-            income_other.id if income_other else None,
-        )
+        for offset in range(0, total, chunk_size):
+            chunk = valid_rows[offset:offset + chunk_size]
+            existing = _existing_fingerprints(session, [r.get("fingerprint") for r in chunk])
+            rows, deltas = [], {}
+            for row in chunk:
+                if row.get("fingerprint") in existing:
+                    continue
+                cents = to_cents(row["amount"])
+                rows.append({
+                    "date": row["date"],
+                    "amount_cents": cents,
+                    "category_id": row["category_id"],
+                    "description": row["description"],
+                    "notes": "",
+                    "source": "import",
+                    "flow_type": row["flow_type"],
+                    "fingerprint": row.get("fingerprint"),
+                })
+                add_monthly_delta(deltas, row["category_id"], row["flow_type"], row["date"], cents)
+            if rows:
+                session.execute(insert(Transaction), rows)
+                inserted += len(rows)
+            apply_monthly_deltas(session, deltas)
+            if not atomic:
+                session.commit()
+            if progress:
+                progress(offset + len(chunk), total)
+        if checkpoint:
+            import_key, rows_done = checkpoint
+            session.merge(AppMeta(key=_checkpoint_key(import_key), value=str(rows_done)))
+        session.commit()
+        return inserted
+    finally:
+        session.close()
+
+
+# Streamed imports record how many file rows are safely committed under
+# app_meta["import_checkpoint:<import key>"], so a rerun can pick up from there.
+
+def _checkpoint_key(import_key):
+    return f"import_checkpoint:{import_key}"
+
+
+def get_import_checkpoint(import_key):
+    """Number of data rows of this import already committed (0 if none)."""
+    session = get_session()
+    try:
+        meta = session.get(AppMeta, _checkpoint_key(import_key))
+        return int(meta.value) if meta else 0
     finally:
         session.close()
 
 
-def bulk_import_transactions(valid_rows):
-    """Insert a list of pre-validated transaction dicts. Returns count inserted."""
+def clear_import_checkpoint(import_key):
     session = get_session()
     try:
-        for row in valid_rows:
-            session.add(Transaction(
-                date=row["date"],
-                amount=row["amount"],
-                category_id=row["category_id"],
-                description=row["description"],
-                notes="",
-                source="import",
-                flow_type=row["flow_type"],
-            ))
+        session.query(AppMeta).filter(AppMeta.key == _checkpoint_key(import_key)).delete()
         session.commit()
-        return len(valid_rows)
     finally:
         session.close()
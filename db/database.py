@@ -1,8 +1,10 @@
 import os
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
+from .migrations import upgrade
 from .models import Base
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -10,19 +12,79 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 DB_PATH = os.path.join(DATA_DIR, "budget.db")
-engine = create_engine(f"sqlite:///{DB_PATH}", echo=False)
+
+# ---------------------------------------------------------------------------
+# Engine profile
+# Every setting can be overridden with an environment variable named
+# BUDGET_DB_<KEY>, e.g. BUDGET_DB_CACHE_SIZE_KB=65536.
+# ---------------------------------------------------------------------------
+ENGINE_PROFILE = {
+    # WAL lets readers keep working while an import or recurring catch-up commits
+    "journal_mode": "WAL",
+    # NORMAL is durable across application crashes in WAL mode and avoids an fsync per commit
+    "synchronous": "NORMAL",
+    "cache_size_kb": 32768,
+    "mmap_size_mb": 256,
+    "temp_store": "MEMORY",
+    # How long a writer waits for another session's write lock before giving up
+    "busy_timeout_ms": 10000,
+    # Streamlit runs each browser session on its own thread; size the pool for a
+    # handful of concurrent sessions and let short bursts overflow.
+    "pool_size": 8,
+    "max_overflow": 8,
+    "pool_timeout_s": 30,
+}
+
+
+def _load_profile():
+    profile = {}
+    for key, default in ENGINE_PROFILE.items():
+        raw = os.environ.get(f"BUDGET_DB_{key.upper()}")
+        profile[key] = type(default)(raw) if raw is not None else default
+    return profile
+
+
+def _make_engine(path, profile):
+    eng = create_engine(
+        f"sqlite:///{path}",
+        echo=False,
+        poolclass=QueuePool,
+        pool_size=profile["pool_size"],
+        max_overflow=profile["max_overflow"],
+        pool_timeout=profile["pool_timeout_s"],
+        connect_args={
+            # Pooled connections are handed to whichever session thread checks them out
+            "check_same_thread": False,
+            "timeout": profile["busy_timeout_ms"] / 1000,
+        },
+    )
+
+    @event.listens_for(eng, "connect")
+    def _apply_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            cur.execute(f"PRAGMA journal_mode={profile['journal_mode']}")
+            cur.execute(f"PRAGMA synchronous={profile['synchronous']}")
+            # Negative cache_size is in KiB rather than pages
+            cur.execute(f"PRAGMA cache_size=-{profile['cache_size_kb']}")
+            cur.execute(f"PRAGMA mmap_size={profile['mmap_size_mb'] * 1024 * 1024}")
+            cur.execute(f"PRAGMA temp_store={profile['temp_store']}")
+            cur.execute(f"PRAGMA busy_timeout={profile['busy_timeout_ms']}")
+        finally:
+            cur.close()
+
+    return eng
+
+
+engine_profile = _load_profile()
+engine = _make_engine(DB_PATH, engine_profile)
 SessionLocal = sessionmaker(bind=engine)
 
 
 def init_db():
     Base.metadata.create_all(bind=engine)
-    # Migration: add flow_type column if it doesn't exist (safe for existing databases)
-    with engine.connect() as conn:
-        try:
-            conn.execute(text("ALTER TABLE transactions ADD COLUMN flow_type TEXT"))
-            conn.commit()
-        except Exception:
-            pass  # Column already exists — no action needed
+    # Bring existing databases up to the current schema (see db/migrations.py)
+    upgrade(engine)
 
 
 def get_session():
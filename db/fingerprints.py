@@ -0,0 +1,63 @@
+"""
+Fingerprints identifying imported bank rows.
+
+A fingerprint is the row's date, signed amount in cents and normalised
+description, plus an occurrence counter that tells apart identical rows in
+the same statement (two $4.50 coffees at the same cafe on one day):
+
+    2025-03-01|-450|cafe deluxe|1
+
+A statement imported for a named account has the account in front, so the
+same row in two accounts' statements is two transactions, while a re-import
+of the same account's statement still finds every row already there:
+
+    everyday|2025-03-01|-450|cafe deluxe|1
+
+Rows imported without an account (including every row fingerprinted by the
+migration that added the column) have no prefix.
+
+Imported transactions store it in the uniquely indexed
+transactions.fingerprint column, so checking whether a statement row is
+already in the ledger is an index lookup rather than a table scan.
+"""
+
+from .money import to_cents
+
+
+def normalise_description(description):
+    """Lowercase with runs of whitespace collapsed, so cosmetic bank changes still match."""
+    return " ".join((description or "").lower().split())
+
+
+def signed_cents(amount_cents, flow_type):
+    return amount_cents if flow_type == "income" else -amount_cents
+
+
+def fingerprint_base(when, cents, description):
+    """(day, signed cents, normalised description) — a fingerprint minus its counter."""
+    return (when.strftime("%Y-%m-%d"), cents, normalise_description(description))
+
+
+def make_fingerprint(base, occurrence, account=""):
+    day, cents, description = base
+    fingerprint = f"{day}|{cents}|{description}|{occurrence}"
+    return f"{account}|{fingerprint}" if account else fingerprint
+
+
+def assign_fingerprints(rows, seen=None, account=""):
+    """
+    Set row["fingerprint"] on parsed import rows, in statement order.
+
+    `seen` maps fingerprint bases to how many times they have occurred so far;
+    pass the same dict across the chunks of one file so the counter carries on
+    between them. Returns it. `account` is the account the statement belongs
+    to, "" if unknown.
+    """
+    seen = {} if seen is None else seen
+    for row in rows:
+        base = fingerprint_base(
+            row["date"], signed_cents(to_cents(row["amount"]), row["flow_type"]), row["description"]
+        )
+        seen[base] = seen.get(base, 0) + 1
+        row["fingerprint"] = make_fingerprint(base, seen[base], account)
+    return seen
@@ -0,0 +1,209 @@
+"""
+Merchant rules: categorise imported rows from their description text.
+
+Rules live in the merchant_rules table and match the normalised description
+(see db.fingerprints.normalise_description):
+
+    exact   the whole description equals the pattern
+    prefix  the description starts with the pattern
+    regex   the pattern matches anywhere in the description (case-insensitive)
+
+Exact rules are learned whenever a transaction is moved to another category
+(learn_rule()) and were seeded from existing imports by migration 8; any kind
+can also be added by hand on the Categories page.
+
+The rules compile into one RuleSet — dicts for exact and prefix rules plus a
+single combined regex for the regex rules (one per priority level in use) —
+held in memory until a rule changes, the same way db/category_tree.py caches
+categories.
+"""
+
+import re
+import threading
+
+import pandas as pd
+from sqlalchemy.dialects.sqlite import insert
+
+from .database import get_session
+from .fingerprints import normalise_description
+from .models import Category, MerchantRule
+
+MATCH_TYPES = ("exact", "prefix", "regex")
+
+
+class RuleSet:
+    """
+    Compiled rules. Exact rules are one dict lookup. Prefix and regex rules
+    are grouped by priority, highest first; within a level, prefix rules are a
+    dict per level checked longest prefix first, and all the level's regex
+    rules are one combined pattern whose named groups say which rule matched
+    (see _compile_regexes for rules that can't be combined).
+    """
+
+    def __init__(self, rules):
+        # category_id → flow type, so a rule never puts income into an expense category
+        self.flow_types = {r["category_id"]: r["flow_type"] for r in rules}
+        self.exact = {r["pattern"]: r["category_id"] for r in rules if r["match_type"] == "exact"}
+
+        by_priority = {}
+        for r in sorted(rules, key=lambda r: r["id"]):
+            if r["match_type"] != "exact":
+                by_priority.setdefault(r["priority"], []).append(r)
+        # [(prefix → category_id, prefix lengths longest first, combined regex or None, group → category_id)]
+        self.levels = []
+        for priority in sorted(by_priority, reverse=True):
+            level = by_priority[priority]
+            prefixes = {r["pattern"]: r["category_id"] for r in level if r["match_type"] == "prefix"}
+            regexes = [r for r in level if r["match_type"] == "regex"]
+            groups = {f"rule{r['id']}": r["category_id"] for r in regexes}
+            combined, singles = _compile_regexes(regexes)
+            lengths = sorted({len(p) for p in prefixes}, reverse=True)
+            self.levels.append((prefixes, lengths, combined, groups, singles))
+
+    def __len__(self):
+        return len(self.exact) + sum(len(level[0]) + len(level[3]) for level in self.levels)
+
+    def match(self, description):
+        """Category id for one description (already normalised), or None."""
+        category_id = self.exact.get(description)
+        if category_id is not None:
+            return category_id
+        for prefixes, lengths, combined, groups, singles in self.levels:
+            for length in lengths:
+                category_id = prefixes.get(description[:length])
+                if category_id is not None:
+                    return category_id
+            if combined is not None:
+                m = combined.search(description)
+                if m:
+                    return groups[m.lastgroup]
+            for regex, category_id in singles:
+                if regex.search(description):
+                    return category_id
+        return None
+
+    def classify(self, descriptions, flow_types):
+        """
+        Category ids for a Series of descriptions (NaN where no rule applies).
+        Each distinct normalised description is matched once; a match whose
+        category has the other flow type is dropped.
+        """
+        normalised = descriptions.fillna("").str.lower().str.split().str.join(" ")
+        codes, uniques = pd.factorize(normalised)
+        matches = pd.Series([self.match(u) for u in uniques], dtype="float64")
+        category_ids = pd.Series(matches.to_numpy()[codes], index=descriptions.index)
+        same_flow = category_ids.map(self.flow_types) == flow_types
+        return category_ids.where(same_flow)
+
+
+def _compile_regexes(regexes):
+    """
+    (combined pattern, []) for one priority level's regex rules, or
+    (None, [(pattern, category_id)]) compiled one by one when they can't be
+    joined — e.g. rules saved before validate_rule() rejected named groups.
+    A rule that doesn't compile even alone is left out rather than failing
+    every import.
+    """
+    if not regexes:
+        return None, []
+    try:
+        joined = "|".join(f"(?P<rule{r['id']}>{r['pattern']})" for r in regexes)
+        return re.compile(joined, re.IGNORECASE), []
+    except re.error:
+        pass
+    singles = []
+    for r in regexes:
+        try:
+            singles.append((re.compile(r["pattern"], re.IGNORECASE), r["category_id"]))
+        except re.error:
+            continue
+    return None, singles
+
+
+# A backslash-digit not itself escaped, (?P=name) or a (?(group)...) conditional
+_GROUP_REFERENCE = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?P=|\(\?\(")
+
+
+def validate_rule(match_type, pattern):
+    """The normalised pattern to store, or raise ValueError."""
+    if match_type not in MATCH_TYPES:
+        raise ValueError(f"Unknown match type: {match_type!r}")
+    if match_type == "regex":
+        pattern = pattern.strip()
+        try:
+            compiled = re.compile(pattern)
+            # Compiled the way RuleSet embeds it, so it can't break the combined regex
+            re.compile(f"(?P<rule>{pattern})|(?P<other>x)")
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}")
+        # Group names and numbers are shared across the combined regex
+        if compiled.groupindex:
+            raise ValueError("Named groups are not supported; use (?:...) instead")
+        if _GROUP_REFERENCE.search(pattern):
+            raise ValueError("Backreferences to groups are not supported")
+    else:
+        pattern = normalise_description(pattern)
+    if not pattern:
+        raise ValueError("Pattern cannot be empty")
+    return pattern
+
+
+def learn_rule(session, description, category_id):
+    """
+    Remember, within the caller's transaction, that rows described like this
+    belong in `category_id`. Call invalidate_rule_set() after committing.
+    """
+    pattern = normalise_description(description)
+    if not pattern:
+        return
+    stmt = insert(MerchantRule).values(
+        match_type="exact", pattern=pattern, category_id=category_id, priority=0, source="learned"
+    )
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=["match_type", "pattern"], set_={"category_id": stmt.excluded.category_id}
+    ))
+
+
+_lock = threading.Lock()
+_rule_set = None
+
+
+def _load():
+    session = get_session()
+    try:
+        rows = (
+            session.query(MerchantRule, Category.flow_type)
+            .join(Category, Category.id == MerchantRule.category_id)
+            .all()
+        )
+        return RuleSet([
+            {
+                "id": r.id,
+                "match_type": r.match_type,
+                "pattern": r.pattern,
+                "category_id": r.category_id,
+                "priority": r.priority,
+                "flow_type": flow_type,
+            }
+            for r, flow_type in rows
+        ])
+    finally:
+        session.close()
+
+
+def get_rule_set():
+    global _rule_set
+    rule_set = _rule_set
+    if rule_set is None:
+        with _lock:
+            if _rule_set is None:
+                _rule_set = _load()
+            rule_set = _rule_set
+    return rule_set
+
+
+def invalidate_rule_set():
+    """Drop the compiled rules; the next reader recompiles them. Call after any rule write."""
+    global _rule_set
+    with _lock:
+        _rule_set = None
@@ -0,0 +1,215 @@
+"""
+Versioned schema migrations.
+
+Each entry in MIGRATIONS is applied once per database, in version order, and
+recorded in the schema_migrations table. Fresh databases get the current
+schema from create_all() and then run the same migrations, which are written
+to be no-ops when the change is already present.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import text
+
+from .closure import rebuild_category_closure
+from .fingerprints import fingerprint_base, make_fingerprint, normalise_description, signed_cents
+from .models import SchemaMigration
+from .rollups import rebuild_monthly_totals
+
+
+def _column_exists(conn, table, column):
+    rows = conn.execute(text(f"PRAGMA table_info({table})")).fetchall()
+    return any(r[1] == column for r in rows)
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+def _add_transaction_flow_type(conn):
+    if not _column_exists(conn, "transactions", "flow_type"):
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN flow_type TEXT"))
+
+
+def _add_query_indexes(conn):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_transactions_date ON transactions (date)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_category_date "
+        "ON transactions (category_id, date)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_flow_type_date "
+        "ON transactions (flow_type, date)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_categories_parent_id ON categories (parent_id)"))
+    # Refresh planner statistics so the new indexes are picked up straight away
+    conn.execute(text("ANALYZE"))
+
+
+def _store_amounts_as_cents(conn):
+    # Replace each REAL dollar column with an INTEGER cents column, converting
+    # existing rows in place. DROP COLUMN needs SQLite 3.35+.
+    for table, old, new in (
+        ("transactions", "amount", "amount_cents"),
+        ("budgets", "monthly_amount", "monthly_amount_cents"),
+        ("recurring_transactions", "amount", "amount_cents"),
+    ):
+        if not _column_exists(conn, table, old):
+            continue
+        if not _column_exists(conn, table, new):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {new} INTEGER NOT NULL DEFAULT 0"))
+        conn.execute(text(f"UPDATE {table} SET {new} = CAST(ROUND({old} * 100) AS INTEGER)"))
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {old}"))
+
+
+def _fts5_available(conn):
+    rows = conn.execute(text("PRAGMA compile_options")).fetchall()
+    return any(r[0] == "ENABLE_FTS5" for r in rows)
+
+
+def _add_transaction_search_index(conn):
+    # External-content FTS5 index over description and notes, kept in step with
+    # the transactions table by triggers. Builds without FTS5 skip it and
+    # search_transactions() falls back to LIKE.
+    if not _fts5_available(conn):
+        return
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5("
+        "description, notes, content='transactions', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN "
+        "INSERT INTO transactions_fts(rowid, description, notes) "
+        "VALUES (new.id, new.description, new.notes); "
+        "END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN "
+        "INSERT INTO transactions_fts(transactions_fts, rowid, description, notes) "
+        "VALUES ('delete', old.id, old.description, old.notes); "
+        "END"
+    ))
+    conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE OF description, notes "
+        "ON transactions BEGIN "
+        "INSERT INTO transactions_fts(transactions_fts, rowid, description, notes) "
+        "VALUES ('delete', old.id, old.description, old.notes); "
+        "INSERT INTO transactions_fts(rowid, description, notes) "
+        "VALUES (new.id, new.description, new.notes); "
+        "END"
+    ))
+    # Index the rows that already exist
+    conn.execute(text("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')"))
+
+
+def _populate_monthly_totals(conn):
+    # The table itself comes from create_all(); fill it from existing rows
+    rebuild_monthly_totals(conn)
+
+
+def _populate_category_closure(conn):
+    rebuild_category_closure(conn)
+
+
+def _add_import_fingerprints(conn):
+    if not _column_exists(conn, "transactions", "fingerprint"):
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN fingerprint VARCHAR(255)"))
+    # Fingerprint rows imported before this migration, numbering identical rows
+    # in insertion order the same way an import numbers them within a statement
+    rows = conn.execute(text(
+        "SELECT id, date, amount_cents, flow_type, description FROM transactions "
+        "WHERE source = 'import' AND fingerprint IS NULL ORDER BY id"
+    )).fetchall()
+    seen = {}
+    updates = []
+    for tx_id, when, cents, flow_type, description in rows:
+        base = fingerprint_base(datetime.fromisoformat(when), signed_cents(cents, flow_type), description)
+        seen[base] = seen.get(base, 0) + 1
+        updates.append({"id": tx_id, "fp": make_fingerprint(base, seen[base])})
+    if updates:
+        conn.execute(text("UPDATE transactions SET fingerprint = :fp WHERE id = :id"), updates)
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_transactions_fingerprint ON transactions (fingerprint)"
+    ))
+
+
+def _learn_merchant_rules(conn):
+    # The table itself comes from create_all(). Seed exact rules from past
+    # categorisations: a description imported at least twice, always into the
+    # same real (not placeholder) category, becomes a learned rule.
+    rows = conn.execute(text(
+        "SELECT t.description, t.category_id, COUNT(*) FROM transactions t "
+        "JOIN categories c ON c.id = t.category_id "
+        "WHERE t.source = 'import' AND c.name NOT IN ('Uncategorised', 'Other Income') "
+        "GROUP BY t.description, t.category_id"
+    )).fetchall()
+    seen = {}
+    for description, category_id, count in rows:
+        pattern = normalise_description(description)
+        if pattern:
+            categories, total = seen.get(pattern, (set(), 0))
+            seen[pattern] = (categories | {category_id}, total + count)
+    learned = [
+        {"pattern": pattern, "category_id": next(iter(categories))}
+        for pattern, (categories, total) in seen.items()
+        if len(categories) == 1 and total >= 2
+    ]
+    if learned:
+        conn.execute(text(
+            "INSERT OR IGNORE INTO merchant_rules (match_type, pattern, category_id, priority, source) "
+            "VALUES ('exact', :pattern, :category_id, 0, 'learned')"
+        ), learned)
+
+
+# (version, description, function) — append only, never renumber.
+MIGRATIONS = [
+    (1, "Add transactions.flow_type", _add_transaction_flow_type),
+    (2, "Add date, category and flow_type indexes", _add_query_indexes),
+    (3, "Store money as integer cents", _store_amounts_as_cents),
+    (4, "Add full-text search over transaction description and notes", _add_transaction_search_index),
+    (5, "Populate monthly_totals rollup", _populate_monthly_totals),
+    (6, "Populate category_closure hierarchy", _populate_category_closure),
+    (7, "Add unique import fingerprints to transactions", _add_import_fingerprints),
+    (8, "Learn merchant rules from categorised imports", _learn_merchant_rules),
+]
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def applied_versions(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT version FROM schema_migrations")).fetchall()
+    return {r[0] for r in rows}
+
+
+def upgrade(engine):
+    """Apply any pending migrations. Returns the list of versions applied."""
+    done = applied_versions(engine)
+    applied = []
+    for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        # One transaction per migration, so a failure leaves the database at
+        # the previous version. SQLite DDL is transactional, but pysqlite
+        # commits before DDL statements on its own; with the driver in
+        # autocommit mode, the explicit BEGIN/COMMIT here is the only
+        # transaction boundary.
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            conn.exec_driver_sql("BEGIN")
+            try:
+                fn(conn)
+                conn.execute(
+                    SchemaMigration.__table__.insert().values(
+                        version=version, description=description, applied_at=datetime.utcnow()
+                    )
+                )
+            except BaseException:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+            conn.exec_driver_sql("COMMIT")
+        applied.append(version)
+    return applied
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -17,29 +17,42 @@ class Category(Base):
     parent = relationship("Category", remote_side=[id], backref="subtypes")
     transactions = relationship("Transaction", back_populates="category")
 
+    __table_args__ = (
+        Index("ix_categories_parent_id", "parent_id"),
+    )
+
 
 class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True)
     date = Column(DateTime, nullable=False)
-    amount = Column(Float, nullable=False)
+    amount_cents = Column(Integer, nullable=False)  # money is stored as integer cents — see db/money.py
     description = Column(String(200), default="")
     notes = Column(Text, default="")
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     source = Column(String(20), default="manual")   # 'manual', 'import', or 'recurring'
     flow_type = Column(String(10), nullable=True)    # 'income' or 'expense' — stored directly for import rows
+    fingerprint = Column(String(255), nullable=True)  # import rows only — see db/fingerprints.py
     created_at = Column(DateTime, default=datetime.utcnow)
 
     category = relationship("Category", back_populates="transactions")
 
+    # Keep in sync with the index migrations in db/migrations.py
+    __table_args__ = (
+        Index("ix_transactions_date", "date"),
+        Index("ix_transactions_category_date", "category_id", "date"),
+        Index("ix_transactions_flow_type_date", "flow_type", "date"),
+        Index("ux_transactions_fingerprint", "fingerprint", unique=True),
+    )
+
 
 class Budget(Base):
     __tablename__ = "budgets"
 
     id = Column(Integer, primary_key=True)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False, unique=True)
-    monthly_amount = Column(Float, nullable=False)
+    monthly_amount_cents = Column(Integer, nullable=False)
     notes = Column(Text, default="")
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -50,7 +63,7 @@ class RecurringTransaction(Base):
     __tablename__ = "recurring_transactions"
 
     id = Column(Integer, primary_key=True)
-    amount = Column(Float, nullable=False)
+    amount_cents = Column(Integer, nullable=False)
     description = Column(String(200), default="")
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     notes = Column(Text, default="")
@@ -62,3 +75,67 @@ class RecurringTransaction(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     category = relationship("Category")
+
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(200), default="")
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AppMeta(Base):
+    __tablename__ = "app_meta"
+
+    key = Column(String(50), primary_key=True)
+    value = Column(String(200), nullable=False)
+
+
+class MonthlyTotal(Base):
+    """Per-category monthly rollup of transactions, maintained by db/rollups.py."""
+
+    __tablename__ = "monthly_totals"
+
+    category_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    flow_type = Column(String(10), primary_key=True)
+    total_cents = Column(Integer, nullable=False, default=0)
+    tx_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_monthly_totals_period", "year", "month"),
+    )
+
+
+class CategoryClosure(Base):
+    """Every (ancestor, descendant) pair in the category tree, maintained by db/closure.py."""
+
+    __tablename__ = "category_closure"
+
+    ancestor_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)  # 0 = the category itself
+
+    __table_args__ = (
+        Index("ix_category_closure_descendant", "descendant_id", "ancestor_id"),
+    )
+
+
+class MerchantRule(Base):
+    """Import categorisation rule matched against normalised descriptions — see db/merchant_rules.py."""
+
+    __tablename__ = "merchant_rules"
+
+    id = Column(Integer, primary_key=True)
+    match_type = Column(String(10), nullable=False)   # 'exact', 'prefix' or 'regex'
+    pattern = Column(String(200), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    priority = Column(Integer, nullable=False, default=0)  # higher wins among prefix/regex rules
+    source = Column(String(10), nullable=False, default="manual")  # 'manual' or 'learned'
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ux_merchant_rules_match", "match_type", "pattern", unique=True),
+    )
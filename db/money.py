@@ -0,0 +1,22 @@
+"""
+Money conversion helpers.
+
+Amounts are stored as integer cents so that SQL SUMs and pandas/NumPy
+reductions are exact integer arithmetic. The crud layer converts at its
+boundary: callers pass and receive dollars, the database only sees cents.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+
+def to_cents(amount):
+    """Dollars (float, int, str or Decimal) → integer cents, rounding half away from zero."""
+    if amount is None:
+        return 0
+    # str() first so 0.1 becomes Decimal("0.1") rather than its binary approximation
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Integer cents → dollars as a float, for display and form defaults."""
+    return (cents or 0) / 100
@@ -0,0 +1,128 @@
+"""
+Process-wide cache for crud read functions, shared by every browser session.
+
+Each result is keyed on the function, its arguments and the data generation —
+a counter that every crud write bumps once it has finished. Reruns and other
+sessions asking the same question of unchanged data are answered from memory;
+the first read after a write goes back to the database. A read that raced a
+write is stored under the generation it started in, so it is never served.
+
+Entries are kept in LRU order up to MAX_ENTRIES. The generation lives in this
+process: a write made by another process is not seen until the next write or
+clear_read_cache() here.
+"""
+
+import functools
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+MAX_ENTRIES = 256
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_generation = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _freeze(value):
+    """A hashable stand-in for an argument (lists of columns, filter dicts, ...)."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    return value
+
+
+def _copy(value):
+    """A private copy for the caller, so mutating a result can't corrupt the cache."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    # Scalars (numbers, text, dates, Decimals) are immutable and shared as-is
+    return value
+
+
+def cached_read(func):
+    """Serve `func` from the cache while the data generation is unchanged."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            key = (func.__qualname__, _freeze(args), _freeze(kwargs), _generation)
+            hit = key in _entries
+            if hit:
+                _entries.move_to_end(key)
+                value = _entries[key]
+                _stats["hits"] += 1
+            else:
+                _stats["misses"] += 1
+        if hit:
+            return _copy(value)
+
+        value = func(*args, **kwargs)
+        with _lock:
+            if key[-1] == _generation:
+                _entries[key] = value
+                while len(_entries) > MAX_ENTRIES:
+                    _entries.popitem(last=False)
+                    _stats["evictions"] += 1
+        return _copy(value)
+
+    wrapper.uncached = func
+    return wrapper
+
+
+def bump_generation():
+    """Mark every cached result stale. Call after any committed write."""
+    global _generation
+    with _lock:
+        _generation += 1
+        # Nothing from an older generation can be served again
+        _entries.clear()
+
+
+def data_generation():
+    """The current data generation, for callers keeping their own derived results."""
+    return _generation
+
+
+def invalidates_reads(func):
+    """Bump the data generation after `func` runs, whether or not it succeeded."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            bump_generation()
+
+    return wrapper
+
+
+def clear_read_cache():
+    """Drop every entry and reset the statistics."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+        _stats.update(hits=0, misses=0, evictions=0)
+
+
+def read_cache_stats():
+    """{"hits", "misses", "evictions", "hit_rate", "entries", "max_entries", "generation"}"""
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": _stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(_entries),
+            "max_entries": MAX_ENTRIES,
+            "generation": _generation,
+        }
@@ -0,0 +1,80 @@
+"""
+Monthly rollup of transactions (the monthly_totals table).
+
+Every crud write that creates, changes or removes transactions collects
+signed deltas with add_monthly_delta() and applies them with
+apply_monthly_deltas() in the same session, so the rollup commits or rolls
+back together with the rows it summarises. rebuild_monthly_totals()
+recomputes the table from scratch after bulk rewrites, or on demand:
+
+    python -m db.rollups
+"""
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert
+
+from .models import MonthlyTotal
+
+_UPSERT_BATCH = 1000
+
+
+def add_monthly_delta(deltas, category_id, flow_type, when, cents, count=1):
+    """Accumulate a signed change for one transaction into `deltas`."""
+    key = (category_id, when.year, when.month, flow_type)
+    entry = deltas.setdefault(key, [0, 0])
+    entry[0] += cents
+    entry[1] += count
+
+
+def apply_monthly_deltas(session, deltas):
+    """Upsert accumulated deltas into monthly_totals within the caller's transaction."""
+    if not deltas:
+        return
+    rows = [
+        {
+            "category_id": category_id,
+            "year": year,
+            "month": month,
+            "flow_type": flow_type,
+            "total_cents": cents,
+            "tx_count": count,
+        }
+        for (category_id, year, month, flow_type), (cents, count) in deltas.items()
+    ]
+    # Batches stay well under SQLite's bound-parameter limit
+    for i in range(0, len(rows), _UPSERT_BATCH):
+        stmt = insert(MonthlyTotal).values(rows[i:i + _UPSERT_BATCH])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["category_id", "year", "month", "flow_type"],
+            set_={
+                "total_cents": MonthlyTotal.total_cents + stmt.excluded.total_cents,
+                "tx_count": MonthlyTotal.tx_count + stmt.excluded.tx_count,
+            },
+        )
+        session.execute(stmt)
+    # Months that no longer have any transactions drop out of the rollup
+    session.query(MonthlyTotal).filter(MonthlyTotal.tx_count <= 0).delete(synchronize_session=False)
+
+
+def rebuild_monthly_totals(conn):
+    """Recompute monthly_totals from transactions. Accepts a Session or Connection."""
+    conn.execute(text("DELETE FROM monthly_totals"))
+    conn.execute(text(
+        "INSERT INTO monthly_totals (category_id, year, month, flow_type, total_cents, tx_count) "
+        "SELECT t.category_id, "
+        "       CAST(strftime('%Y', t.date) AS INTEGER), "
+        "       CAST(strftime('%m', t.date) AS INTEGER), "
+        "       COALESCE(t.flow_type, c.flow_type), "
+        "       SUM(t.amount_cents), COUNT(*) "
+        "FROM transactions t JOIN categories c ON c.id = t.category_id "
+        "GROUP BY 1, 2, 3, 4"
+    ))
+
+
+if __name__ == "__main__":
+    from .database import engine, init_db
+
+    init_db()
+    with engine.begin() as connection:
+        rebuild_monthly_totals(connection)
+    print("monthly_totals rebuilt.")
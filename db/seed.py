@@ -1,5 +1,9 @@
+from .category_tree import invalidate_category_tree
+from .closure import rebuild_category_closure
 from .database import get_session
-from .models import Budget, Category, RecurringTransaction, Transaction
+from .merchant_rules import invalidate_rule_set
+from .models import Budget, Category, MerchantRule, RecurringTransaction, Transaction
+from .rollups import rebuild_monthly_totals
 
 SEED_DATA = [
     {
@@ -80,7 +84,10 @@ def ensure_uncategorised_category():
             ).first()
             if household:
                 session.add(Category(name="Uncategorised", flow_type="expense", parent_id=household.id))
+                session.flush()
+                rebuild_category_closure(session)
                 session.commit()
+                invalidate_category_tree()
     finally:
         session.close()
 
@@ -106,18 +113,23 @@ def seed_categories():
                 session.add(
                     Category(name=sub_name, flow_type=item["flow_type"], parent_id=parent.id)
                 )
+        session.flush()
+        rebuild_category_closure(session)
         session.commit()
     finally:
         session.close()
+    invalidate_category_tree()
 
 
 def _do_migrate():
     """Replace old generic categories with the custom category structure."""
     session = get_session()
     try:
-        # 1. Wipe budgets and recurring transactions
+        # 1. Wipe budgets, recurring transactions and merchant rules — all keyed
+        #    by category ids that are about to be reissued
         session.query(Budget).delete()
         session.query(RecurringTransaction).delete()
+        session.query(MerchantRule).delete()
         session.flush()
 
         # 2. Delete all old categories (SQLite doesn't enforce FKs by default)
@@ -166,9 +178,16 @@ def _do_migrate():
                 Transaction.flow_type == "income"
             ).update({"category_id": income_other.id}, synchronize_session=False)
 
+        # 6. Every transaction moved category, so recompute the monthly rollup
+        #    and the hierarchy for the new categories
+        rebuild_monthly_totals(session)
+        rebuild_category_closure(session)
+
         session.commit()
     finally:
         session.close()
+    invalidate_category_tree()
+    invalidate_rule_set()
 
 
 def run_migrations():
@@ -0,0 +1,120 @@
+"""
+Cash-flow forecasting for the budget tracker.
+
+Projects the balance forward by expanding every active recurring schedule
+into its future occurrences and adding them to today's balance. Occurrence
+dates are generated with NumPy date arithmetic rather than stepping one date
+at a time, and the expansion is cached per schedule set, so long horizons
+over many schedules stay cheap on every rerun.
+"""
+
+from datetime import date, datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from db.crud import get_balance, get_recurring_transactions
+
+# Fixed-length steps in days; anything unrecognised falls back to 30 days,
+# the same as db.crud._next_date.
+_DAY_STEPS = {"weekly": 7, "fortnightly": 14}
+_MONTH_STEPS = {"monthly": 1, "quarterly": 3, "annually": 12}
+
+
+def occurrence_dates(start, frequency, until):
+    """
+    All occurrences of a schedule from `start` to `until` (both inclusive),
+    as a datetime64[D] array.
+
+    Matches repeatedly applying db.crud._next_date: month-based schedules
+    clip to the end of short months, and once clipped a chain never moves
+    back to a later day (31 Jan → 28 Feb → 28 Mar ...).
+    """
+    start = np.datetime64(start, "D")
+    until = np.datetime64(until, "D")
+    if until < start:
+        return np.array([], dtype="datetime64[D]")
+
+    freq = frequency.lower()
+    if freq not in _MONTH_STEPS:
+        step = _DAY_STEPS.get(freq, 30)
+        return np.arange(start, until + 1, step, dtype="datetime64[D]")
+
+    step = _MONTH_STEPS[freq]
+    start_month = start.astype("datetime64[M]")
+    n = (until.astype("datetime64[M]") - start_month).astype(int) // step + 1
+    months = start_month + np.arange(n) * step
+    days_in_month = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(int)
+    start_day = (start - start_month.astype("datetime64[D]")).astype(int) + 1
+    day = np.minimum.accumulate(np.minimum(start_day, days_in_month))
+    dates = months.astype("datetime64[D]") + (day - 1)
+    return dates[dates <= until]
+
+
+def _schedule_key(rec):
+    return (
+        rec["id"],
+        rec["amount_cents"] if rec["flow_type"] == "income" else -rec["amount_cents"],
+        rec["frequency"],
+        rec["next_run_date"],
+        rec["end_date"],
+    )
+
+
+@lru_cache(maxsize=16)
+def _expand(schedules, first, last):
+    """
+    (dates, signed cents) for every occurrence of every schedule in [first, last].
+
+    `schedules` is a tuple of _schedule_key() tuples; it doubles as the
+    schedule-set version, so any add, edit, pause or run of a schedule
+    produces a new cache entry.
+    """
+    all_dates, all_cents = [], []
+    for _, cents, frequency, next_run, end in schedules:
+        until = min(end, last) if end else last
+        dates = occurrence_dates(next_run, frequency, until)
+        dates = dates[dates >= np.datetime64(first, "D")]
+        all_dates.append(dates)
+        all_cents.append(np.full(len(dates), cents, dtype=np.int64))
+    if not all_dates:
+        return np.array([], dtype="datetime64[D]"), np.array([], dtype=np.int64)
+    return np.concatenate(all_dates), np.concatenate(all_cents)
+
+
+def forecast_balance(horizon_months=12, freq="D", today=None):
+    """
+    Projected balance from today over the next `horizon_months`.
+
+    Args:
+        horizon_months: how far ahead to project
+        freq:           "D" for one row per day, "M" for one row per month
+        today:          start date (defaults to date.today())
+
+    Returns:
+        DataFrame with columns date, income, expense, net and balance (dollars).
+        balance starts from the current net of all recorded transactions.
+    """
+    today = today or date.today()
+    last = today + relativedelta(months=horizon_months)
+    schedules = tuple(sorted(
+        _schedule_key(r) for r in get_recurring_transactions() if r["active"]
+    ))
+    dates, cents = _expand(schedules, today + relativedelta(days=1), last)
+
+    index = pd.date_range(today, last, freq="D")
+    flows = pd.DataFrame({"date": dates.astype("datetime64[ns]"), "cents": cents})
+    income = flows[flows["cents"] > 0].groupby("date")["cents"].sum().reindex(index, fill_value=0)
+    expense = -flows[flows["cents"] < 0].groupby("date")["cents"].sum().reindex(index, fill_value=0)
+
+    out = pd.DataFrame({"income": income, "expense": expense})
+    if freq == "M":
+        out = out.resample("MS").sum()
+    out["net"] = out["income"] - out["expense"]
+    start_balance = get_balance(datetime.combine(today, datetime.max.time()))
+    out["balance"] = start_balance + out["net"].cumsum()
+    out = out / 100
+    out.index.name = "date"
+    return out.reset_index()
@@ -0,0 +1,222 @@
+"""
+Import pipelines that go beyond parsing one statement in the page's thread.
+
+parse_statement_files() parses several statements at once in a process pool
+and merges them into one batch, dropping rows that overlapping statements of
+the same account both contain.
+
+stream_import() handles a single statement too large to parse in one go. A
+reader thread parses the file chunk by chunk (import_utils.iter_statement_chunks)
+and hands each parsed chunk to the caller's thread through a bounded queue,
+where it is written with bulk_import_transactions(). Parsing the next chunk
+overlaps with inserting the current one, and at most `queue_size` parsed
+chunks are ever waiting, so memory stays flat however long the file is.
+
+Each chunk is committed together with a checkpoint of how many file rows are
+done. Running the same file again after an interruption re-reads those rows
+without writing them, to rebuild the fingerprint occurrence counters, and
+carries on inserting from the last committed chunk. Rows are fingerprinted as
+they stream, so any already in the ledger are skipped rather than duplicated.
+The counters cover the whole file (a statement need not be in date order), so
+they are the one thing that grows with it: a few dozen bytes per distinct row.
+"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from db.crud import bulk_import_transactions, clear_import_checkpoint, get_import_checkpoint
+from db.fingerprints import assign_fingerprints
+from db.merchant_rules import get_rule_set
+from import_utils import iter_statement_chunks, parse_statement_file
+from statement_readers import statement_account
+
+STREAM_CHUNK_SIZE = 5000
+# Failed rows kept for display; the rest are only counted
+MAX_FAILED_ROWS = 200
+# Head of a streamed file searched for the account it names
+ACCOUNT_SNIFF_BYTES = 64 * 1024
+
+_DONE = object()
+
+
+def _parse_one(name, file_bytes, account, subcat_map, uncat_expense_id, uncat_income_id, rules):
+    """Worker: parse and fingerprint one file, tagging every row with its file name and account."""
+    try:
+        valid_rows, failed_rows = parse_statement_file(
+            file_bytes, subcat_map, uncat_expense_id, uncat_income_id, rules=rules
+        )
+        assign_fingerprints(valid_rows, account=account)
+    except ValueError as e:
+        return [], [], str(e)
+    for r in valid_rows + failed_rows:
+        r["file"] = name
+    for r in valid_rows:
+        r["account"] = account
+    return valid_rows, failed_rows, None
+
+
+def parse_statement_files(files, subcat_map, uncat_expense_id, uncat_income_id, accounts=None, max_workers=None):
+    """
+    Parse several statement files concurrently and merge them into one batch.
+
+    Args:
+        files:        list of (file name, raw bytes)
+        accounts:     optional {file name: account}; a file not listed uses the
+                      account its statement names (statement_account()), or ""
+        max_workers:  pool size (defaults to one process per file, up to the CPU count)
+
+    Returns:
+        (valid_rows, failed_rows, file_errors, overlap)
+        valid_rows:   fingerprinted rows from every file, in file order, each
+                      with "file" and "account" keys; a row that also appears
+                      in an earlier file of the same account (overlapping
+                      statements) is kept only once
+        failed_rows:  parse failures from every file, each with a "file" key
+        file_errors:  {file name: error} for files that could not be read at all
+        overlap:      number of rows dropped as repeats of an earlier file
+    """
+    accounts = accounts or {}
+    # Compiled once here; workers receive it pickled with their arguments
+    rules = get_rule_set()
+    args = [
+        (name, data, accounts[name] if name in accounts else (statement_account(data) or ""),
+         subcat_map, uncat_expense_id, uncat_income_id, rules)
+        for name, data in files
+    ]
+    workers = max_workers or min(len(files), os.cpu_count() or 1)
+    if workers <= 1:
+        # A pool only adds start-up and pickling cost without a second core
+        results = [_parse_one(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_parse_one, *zip(*args)))
+
+    valid_rows, failed_rows, file_errors = [], [], {}
+    # The account is part of the fingerprint, so the same row in another
+    # account's statement is kept, just as the ledger check will keep it
+    seen = set()
+    overlap = 0
+    for (name, _), (file_valid, file_failed, error) in zip(files, results):
+        if error:
+            file_errors[name] = error
+        failed_rows.extend(file_failed)
+        for r in file_valid:
+            if r["fingerprint"] in seen:
+                overlap += 1
+                continue
+            seen.add(r["fingerprint"])
+            valid_rows.append(r)
+    return valid_rows, failed_rows, file_errors, overlap
+
+
+def import_key(file_obj):
+    """Content hash identifying a statement file across reruns, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for block in iter(lambda: file_obj.read(1 << 20), b""):
+        digest.update(block)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def _put(q, item, stop):
+    """Block on a full queue, but give up once the consumer has gone away."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _read_chunks(chunks, q, stop):
+    try:
+        for chunk in chunks:
+            if not _put(q, chunk, stop):
+                return
+    except Exception as e:
+        _put(q, e, stop)
+    else:
+        _put(q, _DONE, stop)
+
+
+def stream_import(file_obj, subcat_map, uncat_expense_id, uncat_income_id,
+                  chunk_size=STREAM_CHUNK_SIZE, queue_size=2, progress=None, account=None):
+    """
+    Import a statement file object chunk by chunk, resuming any earlier partial run.
+
+    Args:
+        file_obj:    seekable binary file object (e.g. from st.file_uploader)
+        chunk_size:  rows parsed and committed at a time
+        queue_size:  parsed chunks allowed to wait for the writer
+        progress:    optional callback(rows_done, fraction) after each commit,
+                     where fraction is the share of the file read so far
+        account:     account the statement belongs to; defaults to the one
+                     it names near its top (statement_account()), or ""
+
+    Returns:
+        {"imported", "duplicates", "failed", "failed_rows" (first MAX_FAILED_ROWS),
+         "resumed_from", "unmapped", "elapsed_s"}
+    """
+    started = time.perf_counter()
+    key = import_key(file_obj)
+    resumed_from = get_import_checkpoint(key)
+    size = file_obj.seek(0, 2) or 1
+    file_obj.seek(0)
+    if account is None:
+        account = statement_account(file_obj.read(ACCOUNT_SNIFF_BYTES)) or ""
+        file_obj.seek(0)
+
+    # Always from the first row: rows before the checkpoint are only counted,
+    # so identical rows on either side of it keep their occurrence numbers
+    chunks = iter_statement_chunks(
+        file_obj, subcat_map, uncat_expense_id, uncat_income_id,
+        chunk_size=chunk_size, rules=get_rule_set(),
+    )
+    q = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_chunks, args=(chunks, q, stop), daemon=True)
+    reader.start()
+
+    imported = duplicates = failed = unmapped = 0
+    failed_rows = []
+    seen = {}
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            rows_done, valid_rows, chunk_failed = item
+            # Counters run over the whole file; identical rows can be any distance apart
+            seen = assign_fingerprints(valid_rows, seen, account)
+            if rows_done <= resumed_from:
+                continue  # committed by the earlier run
+            count = bulk_import_transactions(valid_rows, checkpoint=(key, rows_done))
+            imported += count
+            duplicates += len(valid_rows) - count
+            unmapped += sum(1 for r in valid_rows if not r["mapped"])
+            failed += len(chunk_failed)
+            failed_rows.extend(chunk_failed[:MAX_FAILED_ROWS - len(failed_rows)])
+            if progress:
+                progress(rows_done, min(file_obj.tell() / size, 1.0))
+    finally:
+        stop.set()
+        reader.join()
+
+    clear_import_checkpoint(key)
+    return {
+        "imported": imported,
+        "duplicates": duplicates,
+        "failed": failed,
+        "failed_rows": failed_rows,
+        "resumed_from": resumed_from,
+        "unmapped": unmapped,
+        "elapsed_s": round(time.perf_counter() - started, 2),
+    }
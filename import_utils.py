@@ -1,15 +1,25 @@
 """
-CSV import utilities for the budget tracker.
+Statement import utilities for the budget tracker.
 
-Handles parsing bank statement CSVs and mapping bank categories to
-our internal subcategory names.
+Handles parsing bank statements (read by statement_readers into a common
+columnar batch) and mapping bank categories to our internal subcategory names.
 """
 
-import io
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 
+from statement_readers import (
+    apply_csv_layout,
+    batch_date_format,
+    date_format_example,
+    detect_csv_layout,
+    detect_format,
+    first_line,
+    read_statement,
+)
+
 # ---------------------------------------------------------------------------
 # Bank category → our subcategory name mapping
 # Keys are bank category strings (lowercased).
@@ -37,108 +47,217 @@ BANK_TO_SUBCAT = {
 }
 
 
-def _parse_row(row, subcat_map, uncat_expense_id, uncat_income_id):
+def _text_column(df, name):
     """
-    Parse one CSV row dict.
-    Returns a transaction dict on success.
-    Raises ValueError with a descriptive message on parse failure.
+    Column as stripped strings, matching str(cell).strip() per cell:
+    missing cells become "nan", and a missing column becomes "".
     """
-    # --- Date ---
-    date_str = str(row.get("Date", "")).strip()
-    if not date_str:
-        raise ValueError("Missing date")
-    try:
-        tx_date = datetime.strptime(date_str, "%d %b %y")
-    except ValueError:
-        raise ValueError(f"Cannot parse date: {date_str!r} (expected format: '28 Feb 26')")
+    if name not in df:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[name].astype(str).fillna("nan").str.strip()
 
-    # --- Amount ---
-    raw = str(row.get("Amount", "")).strip().replace(",", "")
-    if not raw:
-        raise ValueError("Missing amount")
-    try:
-        raw_amount = float(raw)
-    except ValueError:
-        raise ValueError(f"Cannot parse amount: {row.get('Amount')!r}")
 
-    flow_type = "expense" if raw_amount < 0 else "income"
-    amount = abs(raw_amount)
+def _reparse_failures(values, text, parse):
+    """
+    Retry, one cell at a time, the non-empty cells a vectorised parser left
+    missing. to_numeric / to_datetime reject a few spellings that float() /
+    strptime() accept (e.g. "1_000"), so this keeps results identical while
+    only touching the rare rejected rows. Returns the mask of real failures.
+    """
+    failed = values.isna() & (text != "")
+    for i in failed[failed].index:
+        try:
+            values[i] = parse(text[i])
+            failed[i] = False
+        except ValueError:
+            pass
+    return failed
 
-    # --- Description: prefer Merchant Name, fall back to Transaction Details ---
-    merchant = str(row.get("Merchant Name", "")).strip()
-    details = str(row.get("Transaction Details", "")).strip()
-    description = merchant if merchant else details
-
-    # --- Category mapping ---
-    bank_cat_raw = str(row.get("Category", "")).strip()
-    bank_cat_key = bank_cat_raw.lower()
-    subcat_name = BANK_TO_SUBCAT.get(bank_cat_key, "__not_found__")
-
-    if subcat_name == "__not_found__":
-        # Bank category not in our mapping at all
-        mapped = False
-        category_id = uncat_expense_id if flow_type == "expense" else uncat_income_id
-    elif subcat_name is None:
-        # Explicitly unmapped (e.g. "Uncategorised")
-        mapped = False
-        category_id = uncat_expense_id if flow_type == "expense" else uncat_income_id
-    else:
-        category_id = subcat_map.get(subcat_name)
-        if category_id:
-            mapped = True
-        else:
-            # Our DB doesn't have that subcategory (shouldn't happen, but safe)
-            mapped = False
-            category_id = uncat_expense_id if flow_type == "expense" else uncat_income_id
-
-    return {
-        "date": tx_date,
-        "amount": amount,
-        "flow_type": flow_type,
-        "description": description,
-        "category_id": category_id,
-        "bank_category": bank_cat_raw,
-        "mapped": mapped,
-        "source": "import",
-    }
-
-
-def parse_csv_file(file_bytes, subcat_map, uncat_expense_id, uncat_income_id):
+
+def parse_statement_file(file_bytes, subcat_map, uncat_expense_id, uncat_income_id, rules=None):
     """
-    Parse an uploaded CSV file.
+    Parse an uploaded statement file (any format statement_readers knows).
+
+    Every step runs on whole columns: dates, amounts, flow type, description
+    and category mapping are computed once per column, and failed rows are
+    picked out with boolean masks.
 
     Args:
         file_bytes:          raw bytes from st.file_uploader
         subcat_map:          {subcategory_name_lower: category_id}
         uncat_expense_id:    category_id for "Uncategorised" expense placeholder
         uncat_income_id:     category_id for "Other Income" income placeholder
+        rules:               optional db.merchant_rules.RuleSet, tried before the bank category
 
     Returns:
         (valid_rows, failed_rows)
         valid_rows:  list of transaction dicts ready for bulk_import_transactions()
         failed_rows: list of {"row": int, "error": str, "description": str}
     """
+    batch, date_format = read_statement(file_bytes)
+    return _parse_frame(batch, subcat_map, uncat_expense_id, uncat_income_id, date_format, rules=rules)
+
+
+def iter_statement_chunks(
+    file_obj, subcat_map, uncat_expense_id, uncat_income_id, chunk_size=5000, skip_rows=0, rules=None
+):
+    """
+    Parse a statement in chunks of `chunk_size` rows.
+
+    `file_obj` is a seekable binary file object. CSVs are read incrementally
+    without loading the whole file; other formats are small enough to read at
+    once and are then handed out in chunks. The first `skip_rows` data rows
+    are skipped, for resuming an interrupted import.
+
+    Yields (rows_done, valid_rows, failed_rows) per chunk, where rows_done
+    counts data rows consumed from the start of the file, skipped rows included.
+    """
+    head = file_obj.read(4096)
+    file_obj.seek(0)
+    if detect_format(first_line(head)) == "csv":
+        batches = _csv_batches(file_obj, chunk_size, skip_rows)
+    else:
+        whole, date_format = read_statement(file_obj.read())
+        batches = (
+            (whole.iloc[i:i + chunk_size], date_format)
+            for i in range(skip_rows, len(whole), chunk_size)
+        )
+
+    rows_done = skip_rows
+    for batch, date_format in batches:
+        valid_rows, failed_rows = _parse_frame(
+            batch, subcat_map, uncat_expense_id, uncat_income_id, date_format, first_row=rows_done, rules=rules
+        )
+        rows_done += len(batch)
+        yield rows_done, valid_rows, failed_rows
+
+
+def _csv_batches(file_obj, chunk_size, skip_rows):
+    # Cells are read as text by the same C parser as read_csv_statement(), so
+    # each chunk parses the same way whatever rows happen to share it, and
+    # the same way as a whole-file import.
     try:
-        df = pd.read_csv(io.BytesIO(file_bytes))
+        reader = pd.read_csv(
+            file_obj,
+            dtype=str,
+            chunksize=chunk_size,
+            skiprows=range(1, skip_rows + 1) if skip_rows else None,
+        )
     except Exception as e:
         raise ValueError(f"Could not read CSV file: {e}")
 
-    valid_rows = []
+    layout_name = date_format = None
+    with reader:
+        for df in reader:
+            if layout_name is None:
+                layout_name = detect_csv_layout(tuple(df.columns))
+            batch = apply_csv_layout(df, layout_name)
+            # Sniffed from the first chunk and kept, so the whole file agrees
+            date_format = date_format or batch_date_format(batch, layout_name)
+            yield batch, date_format
+
+
+def _parse_frame(df, subcat_map, uncat_expense_id, uncat_income_id, date_format, first_row=0, rules=None):
+    """
+    Parse a statement batch (see statement_readers) into (valid_rows, failed_rows).
+    `first_row` is the number of data rows that came before this batch in the
+    file, so reported row numbers match the file.
+    """
+    df.index = pd.RangeIndex(len(df))
+
+    # --- Date ---
+    date_text = _text_column(df, "Date")
+    # A statement repeats the same few hundred dates, so parse each distinct one once
+    codes, uniques = pd.factorize(date_text)
+    parsed = pd.to_datetime(pd.Series(uniques), format=date_format, errors="coerce")
+    # Plain datetime objects (None where unparsed), the same type strptime returns
+    parsed = np.array(parsed.to_numpy("datetime64[us]").tolist(), dtype=object)
+    dates = pd.Series(parsed[codes], index=df.index, dtype=object)
+    date_failed = _reparse_failures(dates, date_text, lambda s: datetime.strptime(s, date_format))
+
+    # --- Amount ---
+    amount_text = _text_column(df, "Amount").str.replace(",", "", regex=False)
+    amounts = pd.to_numeric(amount_text, errors="coerce")
+    amount_failed = _reparse_failures(amounts, amount_text, float)
+    # float() takes "nan" and "inf", which have no value in cents
+    missing_amount = amount_text.str.lower().isin(["", "nan"])
+    amount_failed = amount_failed | (~missing_amount & ~np.isfinite(amounts.astype(float)))
+
+    # --- Description: prefer Merchant Name, fall back to Transaction Details ---
+    merchant = _text_column(df, "Merchant Name")
+    details = _text_column(df, "Transaction Details")
+    description = merchant.where(merchant != "", details)
+
+    # --- Failed rows, reported with the first problem found in each ---
+    missing_date = date_text == ""
+    bad = missing_date | date_failed | missing_amount | amount_failed
+
     failed_rows = []
+    for i in np.flatnonzero(bad).tolist():
+        if missing_date[i]:
+            error = "Missing date"
+        elif date_failed[i]:
+            error = f"Cannot parse date: {date_text[i]!r} (expected format: {date_format_example(date_format)!r})"
+        elif missing_amount[i]:
+            error = "Missing amount"
+        else:
+            error = f"Cannot parse amount: {df['Amount'][i]!r}"
+        row_no = first_row + i + 2   # +2: header row + 1-based index
+        failed_rows.append({
+            "row": row_no,
+            "error": error,
+            "description": description[i] or f"row {row_no}",
+        })
 
-    for i, (_, row) in enumerate(df.iterrows()):
-        try:
-            parsed = _parse_row(row, subcat_map, uncat_expense_id, uncat_income_id)
-            valid_rows.append(parsed)
-        except ValueError as e:
-            # Build a short label for the failed row
-            merchant = str(row.get("Merchant Name", "")).strip()
-            details = str(row.get("Transaction Details", "")).strip()
-            label = merchant or details or f"row {i + 2}"
-            failed_rows.append({
-                "row": i + 2,   # +2: header row + 1-based index
-                "error": str(e),
-                "description": label,
-            })
+    # --- Valid rows ---
+    ok = ~bad
+    raw_amount = amounts[ok].astype(float)
+    flow_type = pd.Series(np.where(raw_amount < 0, "expense", "income"), index=raw_amount.index)
+
+    # Category mapping: a merchant rule on the description wins; otherwise
+    # bank category → our subcategory name → category id. Unknown, explicitly
+    # unmapped (None) or absent subcategories all fall back to the
+    # Uncategorised placeholder for the row's flow type.
+    bank_category = _text_column(df, "Category")[ok]
+    category_ids = bank_category.str.lower().map(BANK_TO_SUBCAT).map(subcat_map)
+    by_bank = category_ids.notna() & (category_ids.fillna(0) != 0)
+    by_rule = pd.Series(False, index=category_ids.index)
+    if rules:
+        rule_ids = rules.classify(description[ok], flow_type)
+        by_rule = rule_ids.notna()
+        category_ids = rule_ids.where(by_rule, category_ids)
+    mapped = by_rule | by_bank
+    mapped_by = pd.Series(
+        np.where(by_rule, "rule", np.where(by_bank, "bank", None)), index=mapped.index, dtype=object
+    )
+    # Built as objects so the ids stay ints even when one placeholder is missing (None)
+    placeholder = pd.Series(
+        np.where(flow_type == "expense", uncat_expense_id, uncat_income_id), index=flow_type.index, dtype=object
+    )
+    category_ids = category_ids.astype("Int64").astype(object).where(mapped, placeholder)
+
+    valid_rows = [
+        {
+            "date": tx_date,
+            "amount": amount,
+            "flow_type": flow,
+            "description": desc,
+            "category_id": category_id,
+            "bank_category": bank_cat,
+            "mapped": is_mapped,
+            "mapped_by": how,
+            "source": "import",
+        }
+        for tx_date, amount, flow, desc, category_id, bank_cat, is_mapped, how in zip(
+            dates[ok].tolist(),
+            raw_amount.abs().tolist(),
+            flow_type.tolist(),
+            description[ok].tolist(),
+            category_ids.tolist(),
+            bank_category.tolist(),
+            mapped.tolist(),
+            mapped_by.tolist(),
+        )
+    ]
 
     return valid_rows, failed_rows
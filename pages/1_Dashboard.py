@@ -3,13 +3,14 @@ from datetime import date, datetime, timedelta
 import pandas as pd
 import plotly.express as px
 import streamlit as st
+from dateutil.relativedelta import relativedelta
 
-from db.crud import get_budget_vs_actual, get_transactions
-from db.database import init_db
-from db.seed import seed_categories
+from db.bootstrap import ensure_bootstrapped
+from db.crud import get_budget_matrix, get_dashboard_summary
+from downsample import downsample
+from forecast import forecast_balance
 
-init_db()
-seed_categories()
+ensure_bootstrapped()
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
 st.title("📊 Dashboard")
@@ -45,25 +46,17 @@ else:
 start_dt = datetime.combine(start, datetime.min.time()) if start else None
 end_dt = datetime.combine(end, datetime.max.time()) if end else None
 
-txs = get_transactions(start_dt, end_dt)
+# KPIs, chart series and the top-10 table, all aggregated in the database
+summary = get_dashboard_summary(start_dt, end_dt)
 
-if not txs:
+if not summary["tx_count"]:
     st.info("No transactions found for the selected period. Add some transactions to see your dashboard.")
     st.stop()
 
-df = pd.DataFrame(txs)
-df["date"] = pd.to_datetime(df["date"])
-df["month"] = df["date"].dt.to_period("M").astype(str)
-df["signed_amount"] = df.apply(
-    lambda r: r["amount"] if r["flow_type"] == "income" else -r["amount"], axis=1
-)
-
-income_df = df[df["flow_type"] == "income"]
-expense_df = df[df["flow_type"] == "expense"]
-
-total_income = income_df["amount"].sum()
-total_expenses = expense_df["amount"].sum()
-net = total_income - total_expenses
+# Totals are summed as integer cents and converted once, so they are exact
+total_income = summary["income_cents"] / 100
+total_expenses = summary["expense_cents"] / 100
+net = summary["net_cents"] / 100
 
 # --- KPI Cards ---
 st.markdown("---")
@@ -78,8 +71,9 @@ chart1, chart2 = st.columns(2)
 
 with chart1:
     st.subheader("Monthly Income vs Expenses")
-    monthly = df.groupby(["month", "flow_type"])["amount"].sum().reset_index()
+    monthly = summary["monthly"]
     monthly.columns = ["Month", "Type", "Amount"]
+    monthly["Amount"] = monthly["Amount"] / 100
     monthly["Type"] = monthly["Type"].str.capitalize()
     fig1 = px.bar(
         monthly,
@@ -94,23 +88,26 @@ with chart1:
 
 with chart2:
     st.subheader("Expenses by Type")
-    if expense_df.empty:
+    by_type = summary["expense_by_type"]
+    if by_type.empty:
         st.info("No expense data for this period.")
     else:
-        by_type = expense_df.groupby("type")["amount"].sum().reset_index()
+        by_type["amount"] = by_type["total_cents"] / 100
         fig2 = px.pie(by_type, values="amount", names="type", hole=0.45)
         fig2.update_layout(margin=dict(t=20, b=20))
         st.plotly_chart(fig2, use_container_width=True)
 
 # --- Row 2: Cumulative net line ---
 st.subheader("Cumulative Net Over Time")
-df_sorted = df.sort_values("date").copy()
-df_sorted["cumulative_net"] = df_sorted["signed_amount"].cumsum()
+daily = summary["daily_net"]
+daily["cumulative_net"] = daily["net_cents"].cumsum() / 100
+# At most CHART_POINT_BUDGET points, drawn with WebGL, however long the range
 fig3 = px.line(
-    df_sorted,
+    downsample(daily, "date", "cumulative_net"),
     x="date",
     y="cumulative_net",
     labels={"date": "Date", "cumulative_net": "Cumulative Net ($)"},
+    render_mode="webgl",
 )
 fig3.add_hline(y=0, line_dash="dash", line_color="gray", opacity=0.5)
 fig3.update_traces(line_color="#3498db")
@@ -119,24 +116,35 @@ st.plotly_chart(fig3, use_container_width=True)
 
 # --- Row 3: Top expense categories ---
 st.subheader("Top Expense Categories")
-if not expense_df.empty:
-    top = expense_df.groupby(["type", "subtype"])["amount"].sum().reset_index()
+top = summary["top_subcategories"]
+if not top.empty:
     top.columns = ["Type", "Subtype", "Total"]
-    top = top.sort_values("Total", ascending=False).head(10)
-    top["Total"] = top["Total"].map(lambda x: f"${x:,.2f}")
+    top["Total"] = top["Total"].map(lambda x: f"${x / 100:,.2f}")
     st.dataframe(top, hide_index=True, use_container_width=True)
 
 # --- Budget Tracker ---
 st.markdown("---")
 st.subheader("🎯 Budget Tracker")
 
-budget_data = get_budget_vs_actual(today.year, today.month)
+# The last 12 months, oldest first, all answered by one budget-matrix call
+trend_months = [today.replace(day=1) - relativedelta(months=i) for i in range(11, -1, -1)]
+trend_periods = [(d.year, d.month) for d in trend_months]
+budget_matrix = get_budget_matrix(trend_periods)
+budget_data = [
+    {
+        "category_id": b["category_id"],
+        "category": b["category"],
+        "flow_type": b["flow_type"],
+        **b["periods"][(today.year, today.month)],
+    }
+    for b in budget_matrix
+]
 
 if not budget_data:
     st.info("No budgets set yet. Go to the **Budgets** page to set monthly targets.")
 else:
-    tab_month, tab_year = st.tabs(
-        [f"This Month ({today.strftime('%B %Y')})", f"This Year ({today.year})"]
+    tab_month, tab_year, tab_trend = st.tabs(
+        [f"This Month ({today.strftime('%B %Y')})", f"This Year ({today.year})", "Last 12 Months"]
     )
 
     with tab_month:
@@ -166,8 +174,8 @@ else:
                 })
         st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
 
-        month_budget_total = sum(b["monthly_budget"] for b in budget_data if b["flow_type"] == "expense")
-        month_actual_total = sum(b["monthly_actual"] for b in budget_data if b["flow_type"] == "expense")
+        month_budget_total = sum(b["monthly_budget_cents"] for b in budget_data if b["flow_type"] == "expense") / 100
+        month_actual_total = sum(b["monthly_actual_cents"] for b in budget_data if b["flow_type"] == "expense") / 100
         mb1, mb2, mb3 = st.columns(3)
         mb1.metric("Total Budget (month)", f"${month_budget_total:,.2f}")
         mb2.metric("Total Actual (month)", f"${month_actual_total:,.2f}")
@@ -205,10 +213,73 @@ else:
                 })
         st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
 
-        annual_budget_total = sum(b["annual_budget"] for b in budget_data if b["flow_type"] == "expense")
-        ytd_actual_total = sum(b["ytd_actual"] for b in budget_data if b["flow_type"] == "expense")
+        annual_budget_total = sum(b["annual_budget_cents"] for b in budget_data if b["flow_type"] == "expense") / 100
+        ytd_actual_total = sum(b["ytd_actual_cents"] for b in budget_data if b["flow_type"] == "expense") / 100
         projected_total = sum(b["projected_annual"] for b in budget_data if b["flow_type"] == "expense")
         yb1, yb2, yb3 = st.columns(3)
         yb1.metric("Annual Budget (expenses)", f"${annual_budget_total:,.2f}")
         yb2.metric("YTD Actual (expenses)", f"${ytd_actual_total:,.2f}")
         yb3.metric("Projected Annual", f"${projected_total:,.2f}")
+
+    with tab_trend:
+        st.caption("Monthly actual as a % of each category's monthly budget")
+        trend_rows = []
+        for b in budget_matrix:
+            row = {"Category": b["category"]}
+            for y, m in trend_periods:
+                row[date(y, m, 1).strftime("%b %y")] = f"{b['periods'][(y, m)]['monthly_pct']:.0f}%"
+            trend_rows.append(row)
+        st.dataframe(pd.DataFrame(trend_rows), hide_index=True, use_container_width=True)
+
+        expense_budgets = [b for b in budget_matrix if b["flow_type"] == "expense"]
+        if expense_budgets:
+            trend = pd.DataFrame([
+                {
+                    "Month": date(y, m, 1).strftime("%b %y"),
+                    "Budget": sum(b["periods"][(y, m)]["monthly_budget_cents"] for b in expense_budgets) / 100,
+                    "Actual": sum(b["periods"][(y, m)]["monthly_actual_cents"] for b in expense_budgets) / 100,
+                }
+                for y, m in trend_periods
+            ]).melt(id_vars="Month", var_name="Series", value_name="Amount")
+            fig4 = px.bar(
+                trend,
+                x="Month",
+                y="Amount",
+                color="Series",
+                barmode="group",
+                color_discrete_map={"Budget": "#95a5a6", "Actual": "#e74c3c"},
+            )
+            fig4.update_layout(margin=dict(t=20, b=20), legend_title_text="", yaxis_title="$")
+            st.plotly_chart(fig4, use_container_width=True)
+
+# --- Cash-flow forecast ---
+st.markdown("---")
+st.subheader("🔮 Cash-flow Forecast")
+
+HORIZONS = {"3 months": 3, "6 months": 6, "1 year": 12, "2 years": 24, "5 years": 60}
+fc1, fc2 = st.columns([1, 3])
+with fc1:
+    horizon_label = st.selectbox("Horizon", list(HORIZONS.keys()), index=2)
+    resolution = st.radio("Resolution", ["Daily", "Monthly"], horizontal=True)
+
+projection = forecast_balance(HORIZONS[horizon_label], "D" if resolution == "Daily" else "M")
+
+with fc2:
+    fig5 = px.line(
+        downsample(projection, "date", "balance"),
+        x="date",
+        y="balance",
+        labels={"date": "Date", "balance": "Projected Balance ($)"},
+        render_mode="webgl",
+    )
+    fig5.add_hline(y=0, line_dash="dash", line_color="gray", opacity=0.5)
+    fig5.update_traces(line_color="#9b59b6")
+    fig5.update_layout(margin=dict(t=20, b=20))
+    st.plotly_chart(fig5, use_container_width=True)
+
+end_balance = projection["balance"].iloc[-1]
+f1, f2, f3 = st.columns(3)
+f1.metric("Projected Income", f"${projection['income'].sum():,.2f}")
+f2.metric("Projected Expenses", f"${projection['expense'].sum():,.2f}")
+f3.metric(f"Balance in {horizon_label}", f"${end_balance:,.2f}")
+st.caption("Projection from your current balance plus active recurring transactions only.")
@@ -2,12 +2,10 @@ from datetime import date, datetime
 
 import streamlit as st
 
+from db.bootstrap import ensure_bootstrapped
 from db.crud import add_transaction, get_parent_categories, get_subcategories
-from db.database import init_db
-from db.seed import seed_categories
 
-init_db()
-seed_categories()
+ensure_bootstrapped()
 
 st.set_page_config(page_title="Add Transaction", page_icon="➕", layout="wide")
 st.title("➕ Add Transaction")
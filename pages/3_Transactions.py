@@ -3,18 +3,19 @@ from datetime import date, datetime
 import pandas as pd
 import streamlit as st
 
+from db.bootstrap import ensure_bootstrapped
 from db.crud import (
-    delete_transaction,
-    get_parent_categories,
-    get_subcategories,
-    get_transactions,
-    update_transaction,
+    TRANSACTION_FRAME_COLUMNS,
+    apply_transaction_edits,
+    get_all_categories,
+    get_transaction_totals,
+    get_transactions_page,
+    search_transactions,
 )
-from db.database import init_db
-from db.seed import seed_categories
 
-init_db()
-seed_categories()
+PAGE_SIZE = 100
+
+ensure_bootstrapped()
 
 st.set_page_config(page_title="Transactions", page_icon="📋", layout="wide")
 st.title("📋 Transactions")
@@ -33,124 +34,156 @@ with st.expander("Filters", expanded=True):
             "Source", ["manual", "import", "recurring"], default=["manual", "import", "recurring"]
         )
     with fc3:
-        search = st.text_input("Search description")
+        search = st.text_input("Search description & notes", help='Words match by prefix; use "quotes" for a phrase.')
+        rank_by_relevance = st.checkbox("Sort by relevance", value=False, disabled=not search.strip())
         show_uncat = st.checkbox("Show only Uncategorised", value=False)
 
 start_dt = datetime.combine(start_date, datetime.min.time())
 end_dt = datetime.combine(end_date, datetime.max.time())
 
-txs = get_transactions(start_dt, end_dt)
-
-if not txs:
-    st.info("No transactions found. Try adjusting the filters or add some transactions.")
-    st.stop()
-
-df = pd.DataFrame(txs)
-df["date"] = pd.to_datetime(df["date"]).dt.date
-
-# Apply filters
-if flow_filter:
-    df = df[df["flow_type"].isin([f.lower() for f in flow_filter])]
-if source_filter:
-    df = df[df["source"].isin(source_filter)]
-if show_uncat:
-    df = df[df["subtype"] == "Uncategorised"]
-if search:
-    df = df[df["description"].str.contains(search, case=False, na=False)]
-
-if df.empty:
+filters = {
+    "start_date": start_dt,
+    "end_date": end_dt,
+    "flow_types": [f.lower() for f in flow_filter] or None,
+    "sources": source_filter or None,
+    "category_ids": (
+        [c["id"] for c in get_all_categories() if c["name"] == "Uncategorised"] if show_uncat else None
+    ),
+    "search": search.strip() or None,
+}
+
+# Filtering, totals and paging all happen in SQL; only one page of rows is loaded.
+totals = get_transaction_totals(**filters)
+
+if totals["count"] == 0:
     st.info("No transactions match the current filters.")
     st.stop()
 
-# --- Display table ---
-display_df = df[["id", "date", "flow_type", "type", "subtype", "description", "amount", "source"]].copy()
-display_df.columns = ["ID", "Date", "Flow", "Type", "Subtype", "Description", "Amount ($)", "Source"]
-display_df["Flow"] = display_df["Flow"].str.capitalize()
-display_df["Amount ($)"] = display_df["Amount ($)"].map(lambda x: f"${x:,.2f}")
+# Keyset pagination: keep a stack of page cursors, reset whenever the filters change
+filter_key = repr((sorted(filters.items()), rank_by_relevance))
+if st.session_state.get("tx_filter_key") != filter_key:
+    st.session_state.tx_filter_key = filter_key
+    st.session_state.tx_cursors = [None]
+cursors = st.session_state.tx_cursors
+
+if rank_by_relevance and filters["search"]:
+    # Ranked search shows the best matches only, so there is no paging
+    page_filters = {k: v for k, v in filters.items() if k != "search"}
+    df, next_cursor = search_transactions(filters["search"], limit=PAGE_SIZE, **page_filters), None
+else:
+    df, next_cursor = get_transactions_page(after=cursors[-1], limit=PAGE_SIZE, **filters)
+df["date"] = df["date"].dt.date
+
+# --- Edit grid: one page of rows, changes saved together ---
+# Category cells show "Type › Subtype"; the label maps back to the category id
+categories = {c["id"]: c for c in get_all_categories()}
+category_labels = {}
+for c in sorted(categories.values(), key=lambda c: (c["flow_type"], c["name"])):
+    top = c
+    while top["parent_id"] is not None:
+        top = categories[top["parent_id"]]
+    label = c["name"] if top is c else f"{top['name']} › {c['name']}"
+    if label in category_labels.values():
+        label = f"{label} ({c['flow_type']})"
+    category_labels[c["id"]] = label
+# Transactions belong to subcategories, as on the Add page; a parent only
+# keeps a label here for any legacy row already filed under it
+category_ids = {
+    label: cid for cid, label in category_labels.items() if categories[cid]["parent_id"] is not None
+}
+
+grid = pd.DataFrame({
+    "Delete": False,
+    "ID": df["id"],
+    "Date": df["date"],
+    "Flow": df["flow_type"].astype(str).str.capitalize(),
+    "Category": df["category_id"].map(category_labels),
+    "Description": df["description"].fillna("").astype(object),
+    "Amount ($)": df["amount"],
+    "Notes": df["notes"].fillna("").astype(object),
+    "Source": df["source"].astype(str),
+})
+EDITABLE = ["Date", "Category", "Description", "Amount ($)", "Notes"]
+
+if "tx_grid_version" not in st.session_state:
+    st.session_state.tx_grid_version = 0
+edited = st.data_editor(
+    grid,
+    key=f"tx_grid_{st.session_state.tx_grid_version}_{filter_key}_{len(cursors)}",
+    hide_index=True,
+    use_container_width=True,
+    disabled=["ID", "Flow", "Source"],
+    column_config={
+        "Delete": st.column_config.CheckboxColumn("🗑️", help="Tick to delete this transaction"),
+        "Date": st.column_config.DateColumn("Date", required=True),
+        "Category": st.column_config.SelectboxColumn(
+            "Category", options=list(category_ids), required=True,
+            help="Moving a transaction to another category teaches a merchant rule for its description",
+        ),
+        "Amount ($)": st.column_config.NumberColumn("Amount ($)", min_value=0.01, format="dollar", required=True),
+    },
+)
 
-st.dataframe(display_df, hide_index=True, use_container_width=True)
+# Diff the grid against the page as loaded; only changed cells are sent
+edited["Date"] = pd.to_datetime(edited["Date"]).dt.date
+changed = edited[EDITABLE].fillna("").ne(grid[EDITABLE].fillna("")).any(axis=1) & ~edited["Delete"]
+updates = []
+for (_, new), (_, old) in zip(edited[changed].iterrows(), grid[changed].iterrows()):
+    update = {"id": int(new["ID"])}
+    if new["Date"] != old["Date"]:
+        update["date"] = datetime.combine(new["Date"], datetime.min.time())
+    if new["Category"] != old["Category"]:
+        update["category_id"] = category_ids[new["Category"]]
+    if new["Description"] != old["Description"]:
+        update["description"] = new["Description"] or ""
+    if new["Amount ($)"] != old["Amount ($)"]:
+        update["amount"] = float(new["Amount ($)"])
+    if new["Notes"] != old["Notes"]:
+        update["notes"] = new["Notes"] or ""
+    updates.append(update)
+deletes = edited.loc[edited["Delete"], "ID"].astype(int).tolist()
+
+if updates or deletes:
+    gc1, gc2 = st.columns([3, 1])
+    gc1.caption(
+        f"{len(updates)} edited, {len(deletes)} marked for deletion — "
+        "unsaved changes are lost when you change page or filters."
+    )
+    confirm = not deletes or gc1.checkbox(f"I confirm I want to delete {len(deletes)} transaction(s)")
+    if gc2.button("Save changes", type="primary", disabled=not confirm, use_container_width=True):
+        result = apply_transaction_edits(updates=updates, deletes=deletes)
+        st.session_state.tx_grid_version += 1
+        st.toast(f"Saved: {result['updated']} updated, {result['deleted']} deleted.")
+        st.rerun()
 
-totals = df.groupby("flow_type")["amount"].sum()
-income_total = totals.get("income", 0)
-expense_total = totals.get("expense", 0)
+page_no = len(cursors)
+first_row = (page_no - 1) * PAGE_SIZE + 1
+pc1, pc2, pc3 = st.columns([1, 2, 1])
+if pc1.button("← Newer", disabled=page_no == 1, use_container_width=True):
+    cursors.pop()
+    st.rerun()
+if next_cursor is None and page_no == 1 and rank_by_relevance and filters["search"]:
+    pc2.caption(f"Best {len(df):,} of {totals['count']:,} matches, most relevant first")
+else:
+    pc2.caption(f"Showing {first_row:,}–{first_row + len(df) - 1:,} of {totals['count']:,} transactions")
+if pc3.button("Older →", disabled=next_cursor is None, use_container_width=True):
+    cursors.append(next_cursor)
+    st.rerun()
+
+income_total = totals["income_cents"] / 100
+expense_total = totals["expense_cents"] / 100
 m1, m2, m3 = st.columns(3)
 m1.metric("Income (filtered)", f"${income_total:,.2f}")
 m2.metric("Expenses (filtered)", f"${expense_total:,.2f}")
 m3.metric("Net (filtered)", f"${income_total - expense_total:,.2f}")
 
-csv = df.to_csv(index=False)
-st.download_button("Export to CSV", csv, "transactions.csv", "text/csv")
-
-st.markdown("---")
-
-# --- Delete ---
-with st.expander("🗑️ Delete a Transaction"):
-    options = {
-        f"#{row['id']} | {row['date']} | ${row['amount']:.2f} | {row['subtype']} | {row['description']}": row[
-            "id"
-        ]
-        for _, row in df.iterrows()
-    }
-    selected_del = st.selectbox("Select transaction to delete", list(options.keys()), key="del_select")
-    confirm = st.checkbox("I confirm I want to delete this transaction")
-    if st.button("Delete", type="primary", disabled=not confirm):
-        delete_transaction(options[selected_del])
-        st.success("Transaction deleted.")
-        st.rerun()
-
-st.markdown("---")
-
-# --- Edit ---
-with st.expander("✏️ Edit a Transaction"):
-    edit_options = {
-        f"#{row['id']} | {row['date']} | ${row['amount']:.2f} | {row['subtype']} | {row['description']}": row
-        for _, row in df.iterrows()
-    }
-    selected_edit_key = st.selectbox(
-        "Select transaction to edit", list(edit_options.keys()), key="edit_select"
+# The export covers every filtered row, so only load them when asked
+if st.button("Prepare CSV export"):
+    export_df, _ = get_transactions_page(
+        limit=None,
+        columns=[c for c in TRANSACTION_FRAME_COLUMNS if c != "amount_cents"],
+        **filters,
     )
-    row = edit_options[selected_edit_key]
-
-    # Flow type radio — triggers cascade
-    new_flow_label = st.radio(
-        "Income or Expense?",
-        ["Expense", "Income"],
-        index=0 if row["flow_type"] == "expense" else 1,
-        horizontal=True,
-        key="edit_flow",
+    st.download_button(
+        "Download CSV", export_df.to_csv(index=False), "transactions.csv", "text/csv"
     )
-    new_flow = "expense" if new_flow_label == "Expense" else "income"
-
-    new_parents = get_parent_categories(new_flow)
-    new_parent_map = {p["name"]: p["id"] for p in new_parents}
-    type_options = list(new_parent_map.keys())
-    type_idx = type_options.index(row["type"]) if row["type"] in type_options else 0
-    new_type = st.selectbox("Category", type_options, index=type_idx, key="edit_type")
-
-    new_subs = get_subcategories(new_parent_map[new_type])
-    new_sub_map = {s["name"]: s["id"] for s in new_subs}
-    sub_options = list(new_sub_map.keys())
-    sub_idx = sub_options.index(row["subtype"]) if row["subtype"] in sub_options else 0
-    new_sub = st.selectbox("Subcategory", sub_options, index=sub_idx, key="edit_sub")
-
-    ec1, ec2 = st.columns(2)
-    with ec1:
-        new_date = st.date_input("Date", value=row["date"], key="edit_date")
-        new_amount = st.number_input(
-            "Amount ($)", value=float(row["amount"]), min_value=0.01, step=0.01, key="edit_amount"
-        )
-    with ec2:
-        new_desc = st.text_input("Description", value=row["description"], key="edit_desc")
-        new_notes = st.text_area("Notes", value=row["notes"], key="edit_notes")
-
-    if st.button("Save Changes", type="primary"):
-        update_transaction(
-            tx_id=row["id"],
-            date=datetime.combine(new_date, datetime.min.time()),
-            amount=new_amount,
-            category_id=new_sub_map[new_sub],
-            description=new_desc,
-            notes=new_notes,
-        )
-        st.success("Transaction updated.")
-        st.rerun()
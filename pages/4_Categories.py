@@ -1,20 +1,25 @@
 import streamlit as st
 
-from db.crud import add_category, delete_category, get_all_categories, get_parent_categories
-from db.database import init_db
-from db.seed import seed_categories
+from db.bootstrap import ensure_bootstrapped
+from db.crud import (
+    add_category,
+    add_merchant_rule,
+    delete_category,
+    delete_merchant_rule,
+    get_all_categories,
+    get_merchant_rules,
+    get_parent_categories,
+    get_subcategories,
+)
 
-init_db()
-seed_categories()
+ensure_bootstrapped()
 
 st.set_page_config(page_title="Categories", page_icon="🗂️", layout="wide")
 st.title("🗂️ Categories")
 st.markdown("Manage the categories and subcategories used to classify transactions.")
 st.markdown("---")
 
-cats = get_all_categories()
-parents = [c for c in cats if c["parent_id"] is None]
-children = [c for c in cats if c["parent_id"] is not None]
+parents = get_parent_categories()
 
 # --- Category tree display ---
 col1, col2 = st.columns(2)
@@ -23,7 +28,7 @@ with col1:
     st.subheader("Income")
     for p in [x for x in parents if x["flow_type"] == "income"]:
         with st.expander(f"📂 {p['name']}"):
-            subs = [c for c in children if c["parent_id"] == p["id"]]
+            subs = get_subcategories(p["id"])
             if subs:
                 for s in subs:
                     st.write(f"└ {s['name']}")
@@ -34,7 +39,7 @@ with col2:
     st.subheader("Expenses")
     for p in [x for x in parents if x["flow_type"] == "expense"]:
         with st.expander(f"📂 {p['name']}"):
-            subs = [c for c in children if c["parent_id"] == p["id"]]
+            subs = get_subcategories(p["id"])
             if subs:
                 for s in subs:
                     st.write(f"└ {s['name']}")
@@ -62,8 +67,7 @@ with st.expander("➕ Add a Category Type"):
 # --- Add a Subtype ---
 with st.expander("➕ Add a Subtype"):
     with st.form("add_subtype_form"):
-        all_parents = get_parent_categories()
-        parent_options = {f"{p['name']} ({p['flow_type']})": p for p in all_parents}
+        parent_options = {f"{p['name']} ({p['flow_type']})": p for p in parents}
         selected_parent_key = st.selectbox("Parent Category", list(parent_options.keys()))
         new_sub_name = st.text_input("Subtype Name (e.g. 'Gym')")
         if st.form_submit_button("Add Subtype"):
@@ -91,3 +95,69 @@ with st.expander("🗑️ Delete a Category"):
                 st.rerun()
             else:
                 st.error(msg)
+
+st.markdown("---")
+
+# --- Merchant rules ---
+st.subheader("🧠 Merchant Rules")
+st.caption(
+    "Imported rows whose description matches a rule go straight into its category. "
+    "Rules are learned whenever you move a transaction to a different category, "
+    "and you can add your own here."
+)
+
+rules = get_merchant_rules()
+if rules:
+    st.dataframe(
+        [
+            {
+                "Match": r["match_type"].capitalize(),
+                "Pattern": r["pattern"],
+                "Category": r["category"],
+                "Priority": r["priority"],
+                "Source": r["source"].capitalize(),
+            }
+            for r in rules
+        ],
+        hide_index=True,
+        use_container_width=True,
+    )
+else:
+    st.caption("No rules yet.")
+
+with st.expander("➕ Add a Rule"):
+    with st.form("add_rule_form"):
+        subcats = [c for c in get_all_categories() if c["parent_id"]]
+        subcat_options = {f"{c['name']} ({c['flow_type']})": c["id"] for c in subcats}
+        rule_type = st.radio(
+            "Match",
+            ["Exact", "Prefix", "Regex"],
+            horizontal=True,
+            help="Exact: the whole description. Prefix: the description starts with the pattern. "
+            "Regex: a regular expression found anywhere in it. Matching ignores case and extra spaces.",
+        )
+        rule_pattern = st.text_input("Pattern (e.g. 'woolworths')")
+        rule_category = st.selectbox("Category", list(subcat_options.keys()))
+        rule_priority = st.number_input(
+            "Priority", value=0, step=1, help="Higher wins when several prefix/regex rules match."
+        )
+        if st.form_submit_button("Add Rule"):
+            success, msg = add_merchant_rule(
+                rule_type.lower(), rule_pattern, subcat_options[rule_category], int(rule_priority)
+            )
+            if success:
+                st.success(msg)
+                st.rerun()
+            else:
+                st.error(msg)
+
+if rules:
+    with st.expander("🗑️ Delete a Rule"):
+        rule_options = {
+            f"{r['match_type']}: {r['pattern']} → {r['category']}": r["id"] for r in rules
+        }
+        selected_rule = st.selectbox("Select rule to delete", list(rule_options.keys()))
+        if st.button("Delete Rule", type="primary"):
+            delete_merchant_rule(rule_options[selected_rule])
+            st.success("Rule deleted.")
+            st.rerun()
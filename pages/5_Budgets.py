@@ -1,12 +1,10 @@
 import pandas as pd
 import streamlit as st
 
+from db.bootstrap import ensure_bootstrapped
 from db.crud import delete_budget, get_budgets, get_parent_categories, set_budget
-from db.database import init_db
-from db.seed import seed_categories
 
-init_db()
-seed_categories()
+ensure_bootstrapped()
 
 st.set_page_config(page_title="Budgets", page_icon="🎯", layout="wide")
 st.title("🎯 Budget Settings")
@@ -34,10 +32,10 @@ if budgets:
 
     expense_budgets = [b for b in budgets if b["flow_type"] == "expense"]
     if expense_budgets:
-        total_monthly = sum(b["monthly_amount"] for b in expense_budgets)
+        total_cents = sum(b["monthly_cents"] for b in expense_budgets)
         m1, m2 = st.columns(2)
-        m1.metric("Total Monthly Expense Budget", f"${total_monthly:,.2f}")
-        m2.metric("Total Annual Expense Budget", f"${total_monthly * 12:,.2f}")
+        m1.metric("Total Monthly Expense Budget", f"${total_cents / 100:,.2f}")
+        m2.metric("Total Annual Expense Budget", f"${total_cents * 12 / 100:,.2f}")
 else:
     st.info("No budgets set yet. Add your first one below.")
 
@@ -2,6 +2,7 @@ from datetime import date
 
 import streamlit as st
 
+from db.bootstrap import ensure_bootstrapped
 from db.crud import (
     add_recurring_transaction,
     delete_recurring,
@@ -10,11 +11,8 @@ from db.crud import (
     get_subcategories,
     toggle_recurring,
 )
-from db.database import init_db
-from db.seed import seed_categories
 
-init_db()
-seed_categories()
+ensure_bootstrapped()
 
 st.set_page_config(page_title="Recurring", page_icon="🔄", layout="wide")
 st.title("🔄 Recurring Transactions")
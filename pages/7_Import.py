@@ -1,23 +1,26 @@
 import pandas as pd
 import streamlit as st
 
+from db.bootstrap import ensure_bootstrapped
 from db.crud import (
     build_subcat_name_map,
     bulk_import_transactions,
+    classify_import_rows,
+    get_all_categories,
+    get_import_checkpoint,
     get_uncategorised_ids,
 )
-from db.database import init_db
-from db.seed import ensure_uncategorised_category, seed_categories
-from import_utils import BANK_TO_SUBCAT, parse_csv_file
+from db.read_cache import data_generation
+from import_pipeline import import_key, parse_statement_files, stream_import
+from import_utils import BANK_TO_SUBCAT
+from statement_readers import statement_account
 
-init_db()
-seed_categories()
-ensure_uncategorised_category()
+ensure_bootstrapped()
 
 st.set_page_config(page_title="Import", page_icon="📥", layout="wide")
 st.title("📥 Import Transactions")
 st.markdown(
-    "Upload a bank statement CSV to bulk-import transactions. "
+    "Upload bank statements (CSV, OFX/QFX or QIF) to bulk-import transactions. "
     "Categories are mapped automatically where possible — anything unrecognised "
     "is imported as **Uncategorised** so you can edit it afterwards."
 )
@@ -35,31 +38,120 @@ with st.expander("ℹ️ How bank categories are mapped"):
     ]
     st.dataframe(pd.DataFrame(map_rows), hide_index=True, use_container_width=True)
     st.caption(
-        "Any bank category not in this list will also be imported as Uncategorised. "
-        "You can edit categories in the Transactions page after importing."
+        "Merchant rules (🧠, managed on the Categories page) are checked first and take "
+        "precedence. Any bank category not in this list will also be imported as Uncategorised. "
+        "You can edit categories in the Transactions page after importing — each change "
+        "teaches a rule for that description."
     )
 
 st.markdown("---")
 
 # --- File uploader ---
-uploaded_file = st.file_uploader("Choose a CSV file", type=["csv"])
+uploaded_files = st.file_uploader(
+    "Choose one or more statement files",
+    type=["csv", "ofx", "qfx", "qif"],
+    accept_multiple_files=True,
+    help="Several statements (e.g. a year of months, or more than one account) are parsed "
+    "in parallel and imported together. Rows that appear in more than one file are imported once.",
+)
 
-if not uploaded_file:
-    st.info("Upload a CSV file to preview and import transactions.")
+if not uploaded_files:
+    st.info("Upload a statement file to preview and import transactions.")
     st.stop()
+multi_file = len(uploaded_files) > 1
 
-# --- Parse the file ---
 subcat_map = build_subcat_name_map()
 uncat_expense_id, uncat_income_id = get_uncategorised_ids()
 
-try:
-    file_bytes = uploaded_file.read()
-    valid_rows, failed_rows = parse_csv_file(
-        file_bytes, subcat_map, uncat_expense_id, uncat_income_id
-    )
-except ValueError as e:
-    st.error(f"Could not read file: {e}")
+# --- Streaming mode: no preview, parse and insert chunk by chunk ---
+streaming = st.toggle(
+    "Large file mode",
+    help="Parse and import the file in chunks without previewing it first. Memory use "
+    "stays flat for any file size, and an interrupted import resumes where it stopped.",
+)
+
+if streaming:
+    for uploaded_file in uploaded_files:
+        done_rows = get_import_checkpoint(import_key(uploaded_file))
+        if done_rows:
+            st.info(
+                f"An earlier import of {uploaded_file.name} stopped part-way. "
+                f"It will resume after row {done_rows + 1:,}."
+            )
+    if st.button(f"Import {len(uploaded_files)} file(s)", type="primary", use_container_width=True):
+        for uploaded_file in uploaded_files:
+            st.markdown(f"**{uploaded_file.name}**")
+            progress_bar = st.progress(0.0, text="Importing…")
+            try:
+                result = stream_import(
+                    uploaded_file,
+                    subcat_map,
+                    uncat_expense_id,
+                    uncat_income_id,
+                    progress=lambda rows, fraction: progress_bar.progress(
+                        fraction, text=f"Processed {rows:,} rows"
+                    ),
+                )
+            except ValueError as e:
+                st.error(f"Could not read file: {e}")
+                continue
+            progress_bar.empty()
+            st.success(f"Successfully imported **{result['imported']:,} transactions** in {result['elapsed_s']}s.")
+            if result["duplicates"]:
+                st.info(f"{result['duplicates']:,} row(s) were already imported and have been skipped.")
+            if result["resumed_from"]:
+                st.info(f"Resumed after {result['resumed_from']:,} rows imported by an earlier run.")
+            if result["failed"]:
+                st.warning(f"{result['failed']:,} row(s) were skipped due to parse errors.")
+                st.dataframe(pd.DataFrame(result["failed_rows"]), hide_index=True, use_container_width=True)
+            if result["unmapped"]:
+                st.info(
+                    f"{result['unmapped']:,} transaction(s) were imported as **Uncategorised**. "
+                    "Edit their categories on the **Transactions** page."
+                )
+    st.stop()
+
+# --- Accounts: overlapping rows are only dropped between files of the same account ---
+accounts = {}
+if multi_file:
+    with st.expander("🏦 Accounts"):
+        st.caption(
+            "Files with the same account are treated as overlapping statements, so a row "
+            "in both is imported once. Give each account's files a different name, and "
+            "use the same name each time, so rows imported before are recognised."
+        )
+        for f in uploaded_files:
+            accounts[f.name] = st.text_input(
+                f.name, value=statement_account(f.getvalue()) or "", key=f"account_{f.name}"
+            ).strip()
+
+# --- Parse the files (in parallel when there are several) ---
+# Kept across reruns until the files, their accounts or the data (categories,
+# merchant rules, ledger) change, so widget clicks don't re-parse everything
+parse_key = (
+    tuple((f.name, import_key(f)) for f in uploaded_files),
+    tuple(sorted(accounts.items())),
+    data_generation(),
+)
+cached = st.session_state.get("import_parse")
+if cached is None or cached[0] != parse_key:
+    cached = (parse_key, parse_statement_files(
+        [(f.name, f.getvalue()) for f in uploaded_files],
+        subcat_map, uncat_expense_id, uncat_income_id, accounts=accounts,
+    ))
+    st.session_state.import_parse = cached
+valid_rows, failed_rows, file_errors, overlap_count = cached[1]
+for name, error in file_errors.items():
+    st.error(f"Could not read {name}: {error}")
+if len(file_errors) == len(uploaded_files):
     st.stop()
+if overlap_count:
+    st.info(f"{overlap_count} row(s) appear in more than one file and will be imported once.")
+
+# Match every row against the ledger by fingerprint: new, already imported, or conflicting
+statuses = classify_import_rows(valid_rows)
+duplicate_count = statuses.count("duplicate")
+conflict_count = statuses.count("conflict")
 
 total_rows = len(valid_rows) + len(failed_rows)
 mapped_count = sum(1 for r in valid_rows if r["mapped"])
@@ -72,6 +164,10 @@ m1.metric("Rows found", total_rows)
 m2.metric("Ready to import", len(valid_rows))
 m3.metric("Will be Uncategorised", unmapped_count)
 m4.metric("Parse errors", len(failed_rows), delta=None if not failed_rows else f"-{len(failed_rows)}")
+d1, d2, d3, _ = st.columns(4)
+d1.metric("New", statuses.count("new"))
+d2.metric("Already imported", duplicate_count)
+d3.metric("Conflicting", conflict_count)
 
 # --- Handle failures ---
 if failed_rows:
@@ -84,7 +180,7 @@ if failed_rows:
         )
         with st.expander(f"Show {len(failed_rows)} errors"):
             for f in failed_rows:
-                st.warning(f"Row {f['row']} ({f['description']}): {f['error']}")
+                st.warning(f"{f['file'] + ' — ' if multi_file else ''}Row {f['row']} ({f['description']}): {f['error']}")
         st.stop()
     else:
         st.warning(
@@ -92,7 +188,7 @@ if failed_rows:
             f"The remaining {len(valid_rows)} transaction(s) will be imported."
         )
         for f in failed_rows:
-            st.error(f"Row {f['row']} ({f['description']}): {f['error']}")
+            st.error(f"{f['file'] + ' — ' if multi_file else ''}Row {f['row']} ({f['description']}): {f['error']}")
 
 if not valid_rows:
     st.error("No valid rows found to import.")
@@ -102,17 +198,23 @@ if not valid_rows:
 st.markdown("---")
 st.subheader(f"Preview — {len(valid_rows)} transactions")
 
-# Build reverse map for display: category_id → subcategory name
-id_to_subcat = {v: k.title() for k, v in subcat_map.items()}
+# Build reverse map for display: category_id → category name
+id_to_subcat = {c["id"]: c["name"] for c in get_all_categories()}
+
+STATUS_LABELS = {"new": "🆕 New", "duplicate": "♻️ Already imported", "conflict": "⚠️ Conflicting"}
 
 preview_rows = []
-for r in valid_rows:
-    if r["mapped"]:
+for r, status in zip(valid_rows, statuses):
+    if r["mapped_by"] == "rule":
+        mapped_label = "🧠 " + id_to_subcat.get(r["category_id"], "?")
+    elif r["mapped"]:
         mapped_label = "✅ " + id_to_subcat.get(r["category_id"], "?")
     else:
         mapped_label = "⚠️ Uncategorised"
 
     preview_rows.append({
+        "Status": STATUS_LABELS[status],
+        "File": r["file"],
         "Date": r["date"].strftime("%d %b %Y"),
         "Flow": r["flow_type"].capitalize(),
         "Amount ($)": f"${r['amount']:,.2f}",
@@ -121,7 +223,10 @@ for r in valid_rows:
         "Mapped To": mapped_label,
     })
 
-st.dataframe(pd.DataFrame(preview_rows), hide_index=True, use_container_width=True)
+preview_df = pd.DataFrame(preview_rows)
+if not multi_file:
+    preview_df = preview_df.drop(columns="File")
+st.dataframe(preview_df, hide_index=True, use_container_width=True)
 
 income_total = sum(r["amount"] for r in valid_rows if r["flow_type"] == "income")
 expense_total = sum(r["amount"] for r in valid_rows if r["flow_type"] == "expense")
@@ -133,12 +238,44 @@ pt3.metric("Unmapped (need editing)", unmapped_count)
 # --- Import button ---
 st.markdown("---")
 
+if duplicate_count:
+    st.info(f"{duplicate_count} row(s) were imported before and will be skipped.")
+include_conflicts = False
+if conflict_count:
+    include_conflicts = st.checkbox(
+        f"Also import {conflict_count} conflicting row(s)",
+        value=False,
+        help="A conflicting row has the same date and description as an imported transaction "
+        "but a different amount. It is often an amended charge, but can be a second purchase.",
+    )
+to_import = [
+    r for r, status in zip(valid_rows, statuses)
+    if status == "new" or (status == "conflict" and include_conflicts)
+]
+unmapped_count = sum(1 for r in to_import if not r["mapped"])
+
+all_or_nothing = st.checkbox(
+    "All or nothing",
+    value=True,
+    help="Import everything in one transaction. Untick to commit in chunks, "
+    "keeping the rows already written if the import fails part-way.",
+)
+
 if st.button(
-    f"Import {len(valid_rows)} Transactions",
+    f"Import {len(to_import)} Transactions",
     type="primary",
     use_container_width=True,
+    disabled=not to_import,
 ):
-    count = bulk_import_transactions(valid_rows)
+    progress_bar = st.progress(0.0, text="Importing…")
+    count = bulk_import_transactions(
+        to_import,
+        progress=lambda done, total: progress_bar.progress(
+            done / total, text=f"Imported {done:,} of {total:,}"
+        ),
+        atomic=all_or_nothing,
+    )
+    progress_bar.empty()
     st.success(f"Successfully imported **{count} transactions**.")
     if failed_rows:
         st.warning(f"{len(failed_rows)} row(s) were skipped due to parse errors.")
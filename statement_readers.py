@@ -0,0 +1,307 @@
+"""
+Statement format readers for the import pipeline.
+
+Every reader turns one statement file into the same columnar batch: a
+DataFrame with (some of) the text columns in BATCH_COLUMNS, plus the strptime
+format of its Date column. import_utils parses a batch the same way whatever
+file it came from.
+
+The reader is picked from the file's first line (see READERS), and for CSVs
+the column layout from its header row (see CSV_LAYOUTS); both decisions are
+cached per signature, so a run of statements from the same bank is sniffed
+once. To support another format, append (name, sniff, read) to READERS.
+"""
+
+import html
+import io
+import re
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+
+BATCH_COLUMNS = ["Date", "Amount", "Merchant Name", "Transaction Details", "Category"]
+
+# Tried in order when a layout doesn't fix its date format; day-first wins ties
+DATE_FORMATS = ["%d %b %y", "%d %b %Y", "%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d", "%m/%d/%Y", "%d-%m-%Y", "%d.%m.%Y"]
+_DATE_SAMPLE = 50
+
+
+def date_format_example(date_format):
+    """How a date looks in this format, for error messages (e.g. '28 Feb 26')."""
+    return datetime(2026, 2, 28).strftime(date_format)
+
+
+def sniff_date_format(values):
+    """First of DATE_FORMATS that parses every sampled non-empty value (DATE_FORMATS[0] if none do)."""
+    sample = [v.strip() for v in values[:_DATE_SAMPLE * 4] if isinstance(v, str) and v.strip()][:_DATE_SAMPLE]
+    for fmt in DATE_FORMATS:
+        try:
+            for v in sample:
+                datetime.strptime(v, fmt)
+        except ValueError:
+            continue
+        return fmt
+    return DATE_FORMATS[0]
+
+
+# ---------------------------------------------------------------------------
+# CSV layouts
+#   signature:   lowercased header names that must all be present
+#   columns:     batch column → source header (lowercased); absent ones are skipped
+#   amount:      "signed" (one Amount column) or "debit_credit" (two columns)
+#   date_format: fixed strptime format, or None to sniff it from the data
+# Checked in order; a CSV matching none is read with the first layout.
+# ---------------------------------------------------------------------------
+CSV_LAYOUTS = {
+    # The original bank export
+    "bank": {
+        "signature": {"date", "amount", "transaction details"},
+        "columns": {c: c.lower() for c in BATCH_COLUMNS},
+        "amount": "signed",
+        "date_format": "%d %b %y",
+    },
+    "debit_credit": {
+        "signature": {"date", "description", "debit", "credit"},
+        "columns": {"Date": "date", "Merchant Name": "description", "Category": "category"},
+        "amount": "debit_credit",
+        "date_format": None,
+    },
+    "description_amount": {
+        "signature": {"date", "description", "amount"},
+        "columns": {"Date": "date", "Amount": "amount", "Merchant Name": "description", "Category": "category"},
+        "amount": "signed",
+        "date_format": None,
+    },
+}
+
+
+@lru_cache(maxsize=64)
+def detect_csv_layout(header):
+    """Layout name for a tuple of CSV header names."""
+    names = {h.strip().lower() for h in header}
+    for name, layout in CSV_LAYOUTS.items():
+        if layout["signature"] <= names:
+            return name
+    return next(iter(CSV_LAYOUTS))
+
+
+def _net_amount(debit, credit):
+    """Signed amount text from debit/credit text columns: credit − debit."""
+    debit_text = debit.fillna("").str.strip().str.replace(",", "", regex=False)
+    credit_text = credit.fillna("").str.strip().str.replace(",", "", regex=False)
+    debit_num = pd.to_numeric(debit_text, errors="coerce")
+    credit_num = pd.to_numeric(credit_text, errors="coerce")
+    net = (credit_num.fillna(0).abs() - debit_num.fillna(0).abs()).astype(object)
+    # Both blank → missing amount; anything unparseable → pass the raw text on so it fails
+    net = net.where((debit_text != "") | (credit_text != ""), "")
+    bad = ((debit_text != "") & debit_num.isna()) | ((credit_text != "") & credit_num.isna())
+    return net.where(~bad, debit_text + credit_text)
+
+
+def apply_csv_layout(df, layout_name):
+    """Rename/derive a raw CSV frame's columns into a batch for this layout."""
+    layout = CSV_LAYOUTS[layout_name]
+    by_name = {str(c).strip().lower(): c for c in df.columns}
+    batch = pd.DataFrame(index=df.index)
+    for column, source in layout["columns"].items():
+        if source in by_name:
+            batch[column] = df[by_name[source]]
+    if layout["amount"] == "debit_credit":
+        batch["Amount"] = _net_amount(df[by_name["debit"]], df[by_name["credit"]])
+    return batch
+
+
+def batch_date_format(batch, layout_name):
+    return CSV_LAYOUTS[layout_name]["date_format"] or sniff_date_format(
+        batch["Date"].tolist() if "Date" in batch else []
+    )
+
+
+def read_csv_statement(file_bytes):
+    # Every column as text: the batch parser does its own conversion. The C
+    # engine, like the streaming reader (import_utils._csv_batches): pyarrow
+    # infers numeric types even with dtype=str, so "000123" would come back as
+    # "123" and fingerprints would differ between the two import paths.
+    df = pd.read_csv(io.BytesIO(file_bytes), dtype=str)
+    layout_name = detect_csv_layout(tuple(df.columns))
+    batch = apply_csv_layout(df, layout_name)
+    return batch, batch_date_format(batch, layout_name)
+
+
+# ---------------------------------------------------------------------------
+# OFX / QFX — SGML (v1) or XML (v2); one batch row per <STMTTRN>
+# ---------------------------------------------------------------------------
+_OFX_TRANSACTION = re.compile(r"<STMTTRN>(.*?)(?=</STMTTRN>|<STMTTRN>|</BANKTRANLIST>)", re.S | re.I)
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def read_ofx_statement(file_bytes):
+    text = file_bytes.decode("utf-8", errors="replace")
+    rows = []
+    for block in _OFX_TRANSACTION.findall(text):
+        fields = {tag.upper(): html.unescape(value.strip()) for tag, value in _OFX_FIELD.findall(block)}
+        rows.append({
+            "Date": fields.get("DTPOSTED", "")[:8],
+            "Amount": fields.get("TRNAMT", ""),
+            "Merchant Name": fields.get("NAME") or fields.get("PAYEE", ""),
+            "Transaction Details": fields.get("MEMO", ""),
+            "Category": "",
+        })
+    return pd.DataFrame(rows, columns=BATCH_COLUMNS, dtype=object), "%Y%m%d"
+
+
+# ---------------------------------------------------------------------------
+# QIF — one field per line (D date, T amount, P payee, M memo, L category),
+# records end with "^". Only transaction sections (!Type:Bank, CCard, ...) are read.
+# ---------------------------------------------------------------------------
+_QIF_TRANSACTION_TYPES = {"bank", "cash", "ccard", "oth a", "oth l"}
+_QIF_DATE = re.compile(r"^(\d{1,2})\s*[/.-]\s*(\d{1,2})\s*(['/.-])\s*(\d{2,4})$")
+_QIF_FIELDS = {"D": "Date", "T": "Amount", "U": "Amount", "P": "Merchant Name", "M": "Transaction Details", "L": "Category"}
+
+
+def _qif_dates(values):
+    """QIF dates (1/ 5'24, 01/05/2024, ...) as ISO text; month-first unless a first part is over 12."""
+    parts = [_QIF_DATE.match(v.strip()) for v in values]
+    day_first = any(m and int(m.group(1)) > 12 for m in parts)
+    out = []
+    for value, m in zip(values, parts):
+        if not m:
+            out.append(value)
+            continue
+        first, second, sep, year = m.groups()
+        year = int(year)
+        if year < 100:
+            year += 2000 if sep == "'" or year < 70 else 1900
+        month, day = (second, first) if day_first else (first, second)
+        out.append(f"{year:04d}-{int(month):02d}-{int(day):02d}")
+    return out
+
+
+def read_qif_statement(file_bytes):
+    text = file_bytes.decode("utf-8", errors="replace")
+    rows, record, in_transactions = [], {}, False
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("!"):
+            # !Type:<kind> opens a section; !Account, !Option etc. open non-transaction ones
+            in_transactions = (
+                line.lower().startswith("!type:") and line[6:].strip().lower() in _QIF_TRANSACTION_TYPES
+            )
+            continue
+        if line == "^":
+            if in_transactions and record:
+                rows.append(record)
+            record = {}
+            continue
+        column = _QIF_FIELDS.get(line[0])
+        if column and column not in record:
+            record[column] = line[1:].strip()
+    batch = pd.DataFrame(rows, columns=BATCH_COLUMNS, dtype=object).fillna("")
+    batch["Date"] = _qif_dates(batch["Date"].tolist())
+    return batch, "%Y-%m-%d"
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+def _is_ofx(first_line):
+    return first_line.startswith((b"OFXHEADER", b"<?xml", b"<OFX"))
+
+
+def _is_qif(first_line):
+    return first_line.startswith(b"!")
+
+
+def _is_csv(first_line):
+    return True
+
+
+# (name, sniff(first line) → bool, read(file bytes) → (batch, date format)),
+# tried in order
+READERS = [
+    ("ofx", _is_ofx, read_ofx_statement),
+    ("qif", _is_qif, read_qif_statement),
+    ("csv", _is_csv, read_csv_statement),
+]
+
+
+def first_line(file_bytes):
+    """The first non-blank line, without a UTF-8 BOM — the signature readers are chosen by."""
+    for line in file_bytes[:4096].lstrip(b"\xef\xbb\xbf").splitlines():
+        if line.strip():
+            return line.strip()[:256]
+    return b""
+
+
+@lru_cache(maxsize=64)
+def detect_format(signature):
+    """Reader name for a file whose first line is `signature`."""
+    for name, sniff, _ in READERS:
+        if sniff(signature):
+            return name
+    raise ValueError("Unrecognised statement format")
+
+
+# ---------------------------------------------------------------------------
+# Account identification — which account a statement belongs to, where the
+# file says so, so statements of different accounts aren't taken for overlaps
+# ---------------------------------------------------------------------------
+_OFX_ACCOUNT = re.compile(r"<ACCTID>([^<\r\n]+)", re.I)
+_CSV_ACCOUNT_COLUMNS = ("account", "account number", "account no", "account name")
+
+
+def _ofx_account(file_bytes):
+    m = _OFX_ACCOUNT.search(file_bytes.decode("utf-8", errors="replace"))
+    return m.group(1).strip() if m else None
+
+
+def _qif_account(file_bytes):
+    in_account = False
+    for line in file_bytes.decode("utf-8", errors="replace").splitlines():
+        line = line.strip()
+        if line.lower().startswith("!account"):
+            in_account = True
+        elif in_account and line.startswith("N"):
+            return line[1:].strip() or None
+        elif line == "^" or line.startswith("!"):
+            in_account = False
+    return None
+
+
+def _csv_account(file_bytes):
+    try:
+        df = pd.read_csv(io.BytesIO(file_bytes), dtype=str, nrows=1)
+    except Exception:
+        return None
+    for column in df.columns:
+        if str(column).strip().lower() in _CSV_ACCOUNT_COLUMNS and len(df) and isinstance(df[column].iloc[0], str):
+            return df[column].iloc[0].strip() or None
+    return None
+
+
+_ACCOUNT_READERS = {"ofx": _ofx_account, "qif": _qif_account, "csv": _csv_account}
+
+
+def statement_account(file_bytes):
+    """The account id or name the statement file names, or None if it doesn't."""
+    try:
+        return _ACCOUNT_READERS[detect_format(first_line(file_bytes))](file_bytes)
+    except ValueError:
+        return None
+
+
+def read_statement(file_bytes):
+    """
+    Read any supported statement file into (batch, date format).
+    Raises ValueError if the file cannot be read.
+    """
+    name = detect_format(first_line(file_bytes))
+    read = next(r for n, _, r in READERS if n == name)
+    try:
+        return read(file_bytes)
+    except Exception as e:
+        raise ValueError(f"Could not read {name.upper()} file: {e}")
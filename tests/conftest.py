@@ -0,0 +1,32 @@
+import pytest
+
+from db import bootstrap, category_tree, crud, database, merchant_rules, read_cache
+
+
+def _reset_caches():
+    category_tree.invalidate_category_tree()
+    merchant_rules.invalidate_rule_set()
+    read_cache.clear_read_cache()
+
+
+@pytest.fixture
+def empty_db(tmp_path, monkeypatch):
+    """A new, not yet bootstrapped database in a temporary directory, used by every db function."""
+    original = database.engine
+    engine = database._make_engine(tmp_path / "budget.db", database.engine_profile)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(bootstrap, "_bootstrapped", False)
+    monkeypatch.setattr(crud, "_fts_enabled", None)
+    database.SessionLocal.configure(bind=engine)
+    _reset_caches()
+    yield engine
+    database.SessionLocal.configure(bind=original)
+    engine.dispose()
+    _reset_caches()
+
+
+@pytest.fixture
+def budget_db(empty_db):
+    """A freshly bootstrapped temporary database."""
+    bootstrap.ensure_bootstrapped()
+    return empty_db
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+import pytest
+
+from db import crud
+
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_like_search_matches_wildcards_literally(budget_db, monkeypatch, fts):
+    monkeypatch.setattr(crud, "_fts_enabled", fts)
+    expense_id, _ = crud.get_uncategorised_ids()
+    for description in ["50% off sale", "Cafe Deluxe", "PAY_ROLL", "PAYXROLL", "C:\\drive"]:
+        crud.add_transaction(datetime(2025, 3, 1), 10.0, expense_id, description)
+
+    def found(search):
+        return sorted(crud.search_transactions(search, columns=["description"])["description"])
+
+    # Without word characters the FTS index can't help, so these always use LIKE
+    assert found("%") == ["50% off sale"]
+    assert found("\\") == ["C:\\drive"]
+    if not fts:
+        assert found("_") == ["PAY_ROLL"]
+        assert found("Y_R") == ["PAY_ROLL"]
+        assert crud.get_transaction_totals(search="0%")["count"] == 1
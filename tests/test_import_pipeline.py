@@ -0,0 +1,127 @@
+import io
+
+import pytest
+
+from db.crud import build_subcat_name_map, bulk_import_transactions, classify_import_rows, get_uncategorised_ids
+from db.database import get_session
+from db.models import Transaction
+from import_pipeline import parse_statement_files, stream_import
+
+HEADER = "Date,Amount,Merchant Name,Transaction Details,Category\n"
+
+
+def _statement(rows):
+    return io.BytesIO((HEADER + "".join(f"{day},{amount},{name},,\n" for day, amount, name in rows)).encode())
+
+
+def _import(file_obj, **kwargs):
+    return stream_import(file_obj, build_subcat_name_map(), *get_uncategorised_ids(), **kwargs)
+
+
+def _fingerprints():
+    session = get_session()
+    try:
+        return sorted(fp for (fp,) in session.query(Transaction.fingerprint))
+    finally:
+        session.close()
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _interrupt(rows_done, fraction):
+    raise Interrupted
+
+
+def test_resume_keeps_identical_rows_on_both_sides_of_checkpoint(budget_db):
+    coffee = ("01 Mar 25", "-4.50", "Cafe Deluxe")
+    rows = [coffee, coffee, coffee, coffee, ("02 Mar 25", "-10.00", "Bakery")]
+
+    # The first chunk commits, then the import dies
+    with pytest.raises(Interrupted):
+        _import(_statement(rows), chunk_size=2, progress=_interrupt)
+    assert len(_fingerprints()) == 2
+
+    result = _import(_statement(rows), chunk_size=2)
+    assert result["resumed_from"] == 2
+    assert result["imported"] == 3
+    assert result["duplicates"] == 0
+    assert _fingerprints() == sorted(
+        [f"2025-03-01|-450|cafe deluxe|{n}" for n in range(1, 5)] + ["2025-03-02|-1000|bakery|1"]
+    )
+
+
+def test_identical_rows_separated_by_other_days_are_all_imported(budget_db):
+    coffee = ("01 Mar 25", "-4.50", "Cafe Deluxe")
+    bakery = ("02 Mar 25", "-10.00", "Bakery")
+    # Not in date order: the coffee day is missing from the chunk in between
+    rows = [coffee, bakery, bakery, bakery, coffee]
+
+    result = _import(_statement(rows), chunk_size=2)
+    assert result["imported"] == 5
+    assert result["duplicates"] == 0
+
+
+def _csv(rows):
+    return (HEADER + "".join(f"{day},{amount},{name},,\n" for day, amount, name in rows)).encode()
+
+
+def test_overlap_is_only_dropped_within_an_account(budget_db):
+    coffee = ("01 Mar 25", "-4.50", "Cafe Deluxe")
+    march = _csv([coffee, ("02 Mar 25", "-10.00", "Bakery")])
+    files = [("everyday-1.csv", march), ("everyday-2.csv", march), ("credit.csv", _csv([coffee]))]
+    accounts = {"everyday-1.csv": "everyday", "everyday-2.csv": "everyday", "credit.csv": "credit"}
+
+    valid, failed, errors, overlap = parse_statement_files(files, {}, 90, 91, accounts=accounts)
+
+    assert overlap == 2
+    assert [(r["file"], r["fingerprint"]) for r in valid] == [
+        ("everyday-1.csv", "everyday|2025-03-01|-450|cafe deluxe|1"),
+        ("everyday-1.csv", "everyday|2025-03-02|-1000|bakery|1"),
+        # The other account's identical coffee is kept
+        ("credit.csv", "credit|2025-03-01|-450|cafe deluxe|1"),
+    ]
+
+
+def test_another_accounts_statement_imported_later_is_not_a_duplicate(budget_db):
+    coffee = ("01 Mar 25", "-4.50", "Cafe Deluxe")
+    for name, account in [("everyday.csv", "everyday"), ("credit.csv", "credit"), ("again.csv", "everyday")]:
+        valid, _, _, _ = parse_statement_files([(name, _csv([coffee]))], {}, 90, 91, accounts={name: account})
+        expected = "duplicate" if name == "again.csv" else "new"
+        assert classify_import_rows(valid) == [expected]
+        bulk_import_transactions(valid)
+
+    # The streamed path fingerprints the same way
+    assert _import(_statement([coffee]), account="credit")["duplicates"] == 1
+    assert _import(_statement([coffee]), account="savings")["imported"] == 1
+    assert _fingerprints() == [
+        "credit|2025-03-01|-450|cafe deluxe|1",
+        "everyday|2025-03-01|-450|cafe deluxe|1",
+        "savings|2025-03-01|-450|cafe deluxe|1",
+    ]
+
+
+def test_account_named_in_the_statement_is_used_by_default(budget_db):
+    coffee = "01 Mar 25,-4.50,Cafe Deluxe,,"
+    header = "Date,Amount,Merchant Name,Transaction Details,Category,Account\n"
+    files = [("a.csv", (header + coffee + ",111\n").encode()), ("b.csv", (header + coffee + ",222\n").encode())]
+
+    valid, _, _, overlap = parse_statement_files(files, {}, 90, 91)
+
+    assert overlap == 0
+    assert [r["account"] for r in valid] == ["111", "222"]
+
+
+@pytest.mark.parametrize("amount", ["", "nan", "NaN", "inf"])
+def test_row_without_a_usable_amount_fails_alone(budget_db, amount):
+    rows = [("01 Mar 25", "-4.50", "Cafe Deluxe"), ("02 Mar 25", amount, "Bakery")]
+
+    valid, failed, errors, _ = parse_statement_files([("march.csv", _csv(rows))], {}, 90, 91)
+    assert errors == {}
+    assert [r["description"] for r in valid] == ["Cafe Deluxe"]
+    assert [(r["row"], r["description"]) for r in failed] == [(3, "Bakery")]
+
+    result = _import(_statement(rows))
+    assert result["imported"] == 1
+    assert result["failed"] == 1
@@ -0,0 +1,44 @@
+import pytest
+
+from db.merchant_rules import RuleSet, validate_rule
+
+
+def _rule(rule_id, pattern, category_id, match_type="regex", priority=0):
+    return {
+        "id": rule_id,
+        "match_type": match_type,
+        "pattern": pattern,
+        "category_id": category_id,
+        "priority": priority,
+        "flow_type": "expense",
+    }
+
+
+@pytest.mark.parametrize("pattern", ["(?P<amt>foo)", r"(a)\1", "(?P<x>a)(?P=x)", r"(a)?(?(1)b|c)"])
+def test_validate_rule_rejects_group_names_and_references(pattern):
+    with pytest.raises(ValueError):
+        validate_rule("regex", pattern)
+
+
+@pytest.mark.parametrize("pattern", [r"uber\s*eats", r"(?:coles|woolworths) \d+", r"c:\\1"])
+def test_validate_rule_accepts_plain_regexes(pattern):
+    assert validate_rule("regex", pattern) == pattern
+
+
+def test_rules_that_cannot_be_combined_are_matched_one_by_one():
+    # Saved before validation rejected them: the combined regex would redefine "amt"
+    rules = RuleSet([_rule(1, "(?P<amt>foo)", 10), _rule(2, "(?P<amt>bar)", 20), _rule(3, "(unclosed", 30)])
+    assert rules.match("foo shop") == 10
+    assert rules.match("the bar") == 20
+    assert rules.match("unclosed") is None
+
+
+def test_exact_then_prefix_then_regex():
+    rules = RuleSet([
+        _rule(1, "netflix", 10, "exact"),
+        _rule(2, "netflix", 20, "prefix"),
+        _rule(3, "flix", 30),
+    ])
+    assert rules.match("netflix") == 10
+    assert rules.match("netflix.com") == 20
+    assert rules.match("some flix") == 30
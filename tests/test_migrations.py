@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import text
+
+from db import migrations
+
+
+def _indexes(engine):
+    with engine.connect() as conn:
+        return {r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+
+
+def test_failed_migration_leaves_no_trace(budget_db, monkeypatch):
+    def create_index_then_fail(conn):
+        conn.execute(text("CREATE INDEX ix_test_half_done ON transactions (notes)"))
+        raise RuntimeError("boom")
+
+    version = max(v for v, _, _ in migrations.MIGRATIONS) + 1
+    monkeypatch.setattr(
+        migrations, "MIGRATIONS", migrations.MIGRATIONS + [(version, "Fails part-way", create_index_then_fail)]
+    )
+    with pytest.raises(RuntimeError):
+        migrations.upgrade(budget_db)
+
+    assert "ix_test_half_done" not in _indexes(budget_db)
+    assert version not in migrations.applied_versions(budget_db)
+
+
+def test_migration_commits_its_ddl(budget_db, monkeypatch):
+    def create_index(conn):
+        conn.execute(text("CREATE INDEX ix_test_done ON transactions (notes)"))
+
+    version = max(v for v, _, _ in migrations.MIGRATIONS) + 1
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [(version, "Works", create_index)])
+    assert migrations.upgrade(budget_db) == [version]
+
+    assert "ix_test_done" in _indexes(budget_db)
+    assert version in migrations.applied_versions(budget_db)
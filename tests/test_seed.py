@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from db.bootstrap import ensure_bootstrapped
+from db.crud import get_merchant_rules
+from db.database import get_session
+from db.merchant_rules import get_rule_set
+from db.models import Base, Category, Transaction
+
+
+def test_legacy_category_migration_drops_rules_learned_against_old_ids(empty_db):
+    # A database from before the custom categories: generic ones, and an
+    # import that migration 8 will learn a rule from
+    Base.metadata.create_all(bind=empty_db)
+    session = get_session()
+    try:
+        food = Category(name="Food", flow_type="expense")
+        session.add(food)
+        session.flush()
+        takeaway = Category(name="Takeaway", flow_type="expense", parent_id=food.id)
+        session.add(takeaway)
+        session.flush()
+        for day in (1, 2):
+            session.add(Transaction(
+                date=datetime(2025, 3, day), amount_cents=2500, category_id=takeaway.id,
+                description="Pizza Palace", source="import", flow_type="expense",
+            ))
+        session.commit()
+    finally:
+        session.close()
+
+    ensure_bootstrapped()
+
+    assert get_merchant_rules() == []
+    assert get_rule_set().match("pizza palace") is None
@@ -0,0 +1,26 @@
+import io
+
+from import_utils import iter_statement_chunks, parse_statement_file
+
+# A description column that looks numeric throughout, which type inference would rewrite
+CSV = (
+    "Date,Amount,Merchant Name,Transaction Details,Category\n"
+    "01 Mar 25,-4.50,000123,,Groceries\n"
+    "02 Mar 25,-10.00,1234567890123456789.01,,Dining\n"
+    "03 Mar 25,-3.00,-3,,Dining\n"
+    "04 Mar 25,2500,42,,Salary\n"
+).encode()
+
+SUBCAT_MAP = {"groceries": 1, "dining": 2, "salary": 3}
+
+
+def test_whole_file_and_streaming_reads_agree():
+    whole, whole_failed = parse_statement_file(CSV, SUBCAT_MAP, 90, 91)
+    streamed, streamed_failed = [], []
+    for _, valid, failed in iter_statement_chunks(io.BytesIO(CSV), SUBCAT_MAP, 90, 91, chunk_size=2):
+        streamed.extend(valid)
+        streamed_failed.extend(failed)
+
+    assert whole == streamed
+    assert whole_failed == streamed_failed == []
+    assert [r["description"] for r in whole] == ["000123", "1234567890123456789.01", "-3", "42"]